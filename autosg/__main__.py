@@ -12,7 +12,7 @@ import os
 
 from dotenv import load_dotenv
 
-from autosg import config, sgbot, tgbot
+from autosg import config, metrics, profiling, sgbot, tgbot
 
 
 async def main() -> None:
@@ -21,6 +21,8 @@ async def main() -> None:
     """
     load_dotenv()
     log_level = os.getenv("LOG_LEVEL", default="WARNING")
+    metrics_port = int(os.getenv("METRICS_PORT") or 0)
+    workers = int(os.getenv("SG_WORKERS") or 0)
 
     logging.basicConfig(
         format="[%(asctime)s] %(levelname)s | %(module)s: %(message)s",
@@ -30,13 +32,25 @@ async def main() -> None:
 
     storage, dispatcher = tgbot.init_tg()
     await tgbot.on_startup(dispatcher)
+    profiling.install_signal_handler()
 
     try:
         async with TaskGroup() as tgroup:
             tgroup.create_task(
                 dispatcher.start_polling(config.bot, handle_signals=False)
             )
-            tgroup.create_task(sgbot.start_gw_entering(storage))
+            # let the bot start answering while giveaways entering is loaded
+            await asyncio.to_thread(sgbot.preload)
+
+            if workers:
+                from autosg import cluster  # pylint: disable=import-outside-toplevel
+
+                tgroup.create_task(cluster.Coordinator(storage).run(workers))
+            else:
+                tgroup.create_task(sgbot.start_gw_entering(storage))
+                tgroup.create_task(sgbot.start_deadline_entering())
+            tgroup.create_task(sgbot.start_token_verification())
+            tgroup.create_task(metrics.start_metrics_server(metrics_port))
     finally:
         logging.warning("Exiting...")
 
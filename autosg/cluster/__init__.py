@@ -0,0 +1,11 @@
+"""
+Runs giveaways entering in several worker processes.
+
+Coordinator process owns Telegram dispatcher and storage, workers enter
+giveaways for their consistent-hash shard of users.
+"""
+
+from .coordinator import Coordinator
+from .hashring import HashRing
+
+__all__ = ["Coordinator", "HashRing"]
@@ -0,0 +1,190 @@
+"""Coordinator side of multi-process mode.
+
+Spawns workers, assigns them shards of users from Telegram storage,
+grants request slots of the shared rate limiter, forwards workers'
+notifications to Telegram and collects their statuses and metrics.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from autosg import config, metrics
+from autosg.sgbot import rate_limit
+from autosg.sgbot.status import statuses
+
+from . import ipc, worker
+from .hashring import HashRing
+
+if TYPE_CHECKING:
+    from typing import Coroutine, Dict, List, Set
+
+    from autosg.tgbot.file_storage import JSONStorage
+
+
+SYNC_INTERVAL = 60
+
+
+@dataclass
+class _Worker:
+    """Connection to a worker and deadlines it queued as of its last sync"""
+
+    writer: asyncio.StreamWriter
+    deadlines: Dict[str, List[Dict]] = field(default_factory=dict)
+
+
+class Coordinator:
+    """Owns storage and distributes users among worker processes"""
+
+    def __init__(self, storage: JSONStorage, socket_path: str = "") -> None:
+        self.storage = storage
+        self.socket_path = socket_path or os.path.join(
+            tempfile.gettempdir(), f"autosg-{os.getpid()}.sock"
+        )
+        self.ring = HashRing()
+        self.limiter = rate_limit.RateLimiter()
+        self._workers: Dict[str, _Worker] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._announced: Set[str] = set()
+
+    def _shard(self, name: str) -> Dict:
+        """Storage entries of users assigned to a worker"""
+        return {
+            chat: entry
+            for chat, entry in self.storage.storage.items()
+            if self.ring.node_for(chat) == name
+        }
+
+    async def _rebalance(self) -> None:
+        """Send every worker its current shard of users
+
+        Users configured since the coordinator started are marked new, so
+        only they, and not users moved between workers, get notified.
+        """
+        for name, link in list(self._workers.items()):
+            shard = self._shard(name)
+            new = [
+                chat
+                for chat, entry in shard.items()
+                if chat not in self._announced and "token" in entry.get(chat, {}).get("data", {})
+            ]
+            logging.debug(f"Worker {name}: assigning {len(shard)} users, {len(new)} new")
+            try:
+                await ipc.send(link.writer, {"type": "users", "storage": shard, "new": new})
+            except ConnectionError:
+                logging.warning(f"Worker {name}: failed to send users")
+                continue
+            self._announced.update(new)
+
+    async def _hand_over(self, queued: Dict[str, List[Dict]]) -> None:
+        """Send queued deadlines to workers now owning their users"""
+        shares: Dict[str, Dict[str, List[Dict]]] = {}
+        for tg_id, giveaways in queued.items():
+            shares.setdefault(self.ring.node_for(tg_id) or "", {})[tg_id] = giveaways
+
+        for name, share in shares.items():
+            link = self._workers.get(name)
+            if not link:
+                continue
+            logging.debug(f"Worker {name}: handing over deadlines of {len(share)} users")
+            try:
+                await ipc.send(link.writer, {"type": "deadlines", "deadlines": share})
+            except ConnectionError:
+                logging.warning(f"Worker {name}: failed to hand over deadlines")
+
+    async def _grant(self, writer: asyncio.StreamWriter, request_id: int) -> None:
+        """Grant a request slot once the shared limiter allows it"""
+        await self.limiter.acquire()
+        try:
+            await ipc.send(writer, {"type": "grant", "id": request_id})
+        except ConnectionError:
+            pass
+
+    async def _notify(self, user_id: str, text: str) -> None:
+        """Send a notification on behalf of a worker"""
+        try:
+            await config.bot.send_message(user_id, text)
+        except Exception:
+            logging.exception(f"{user_id}: failed to send notification from worker")
+
+    def _spawn(self, coro: Coroutine) -> None:
+        """Run a coroutine in background keeping a reference to it"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _serve_worker(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Handle messages from a connected worker"""
+        hello = await ipc.receive(reader)
+        if not hello or hello.get("type") != "hello":
+            writer.close()
+            return
+
+        name = hello["worker"]
+        self._workers[name] = _Worker(writer)
+        self.ring.add(name)
+        logging.warning(f"Worker {name} joined, rebalancing users")
+        await self._rebalance()
+
+        try:
+            while message := await ipc.receive(reader):
+                if message["type"] == "acquire":
+                    self._spawn(self._grant(writer, message["id"]))
+                elif message["type"] == "notify":
+                    self._spawn(self._notify(message["user_id"], message["text"]))
+                elif message["type"] == "status":
+                    statuses.merge(message["statuses"])
+                    metrics.merge(name, message.get("metrics", {}))
+                    self._workers[name].deadlines = message.get("deadlines", {})
+                elif message["type"] == "deadlines":
+                    await self._hand_over(message["deadlines"])
+        except ConnectionError:
+            pass
+        finally:
+            link = self._workers.pop(name, None)
+            self.ring.remove(name)
+            writer.close()
+            logging.warning(f"Worker {name} left, rebalancing users")
+            await self._rebalance()
+            if link:
+                await self._hand_over(link.deadlines)
+
+    def _start_workers(self, count: int) -> List[multiprocessing.Process]:
+        """Start worker processes connecting to the coordinator"""
+        context = multiprocessing.get_context("spawn")
+        processes = []
+        for idx in range(count):
+            process = context.Process(
+                target=worker.run,
+                args=(self.socket_path, f"worker-{idx}", os.getenv("LOG_LEVEL", "WARNING")),
+                daemon=True,
+            )
+            process.start()
+            processes.append(process)
+        return processes
+
+    async def run(self, workers: int) -> None:
+        """Serve workers until cancelled"""
+        server = await asyncio.start_unix_server(
+            self._serve_worker, self.socket_path, limit=ipc.MESSAGE_LIMIT
+        )
+        processes = self._start_workers(workers)
+
+        try:
+            async with server:
+                while True:
+                    await asyncio.sleep(SYNC_INTERVAL)
+                    await self._rebalance()
+        finally:
+            for process in processes:
+                process.terminate()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
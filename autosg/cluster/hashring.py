@@ -0,0 +1,51 @@
+"""Consistent hashing of users to workers"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Iterable, List, Optional, Set, Tuple
+
+
+REPLICAS = 64
+
+
+def _hash(key: str) -> int:
+    """Stable hash of a key, same in every process"""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Ring of workers with virtual nodes, moves few users on changes"""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = REPLICAS) -> None:
+        self.replicas = replicas
+        self._ring: List[Tuple[int, str]] = []
+        self.nodes: Set[str] = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        """Add a worker to the ring"""
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            bisect.insort(self._ring, (_hash(f"{node}#{replica}"), node))
+
+    def remove(self, node: str) -> None:
+        """Remove a worker from the ring"""
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        self._ring = [point for point in self._ring if point[1] != node]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """Worker responsible for a key"""
+        if not self._ring:
+            return None
+        idx = bisect.bisect(self._ring, (_hash(key), ""))
+        return self._ring[idx % len(self._ring)][1]
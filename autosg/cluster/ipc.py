@@ -0,0 +1,27 @@
+"""JSON lines messages between coordinator and workers over a Unix socket"""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncio
+    from typing import Dict, Optional
+
+
+MESSAGE_LIMIT = 16 * 1024 * 1024
+
+
+async def send(writer: asyncio.StreamWriter, message: Dict) -> None:
+    """Send a message"""
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+
+
+async def receive(reader: asyncio.StreamReader) -> Optional[Dict]:
+    """Receive a message, None if connection is closed"""
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
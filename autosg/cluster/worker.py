@@ -0,0 +1,180 @@
+"""Worker side of multi-process mode.
+
+Enters giveaways for users assigned by coordinator, paces requests with
+coordinator's shared rate limiter and sends notifications through it.
+A worker can also be started by hand to add capacity:
+
+    python -m autosg.cluster.worker SOCKET_PATH NAME
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import itertools
+import logging
+import sys
+from asyncio import TaskGroup
+from typing import TYPE_CHECKING
+
+from autosg import config, metrics, profiling, sgbot
+from autosg.sgbot import rate_limit
+from autosg.sgbot.deadlines import deadlines
+from autosg.sgbot.sg_interface import Giveaway
+from autosg.sgbot.status import statuses
+
+from . import ipc
+
+if TYPE_CHECKING:
+    from typing import Dict, List
+
+
+STATUS_SYNC_INTERVAL = 30
+
+
+def dump_deadlines(queued: Dict[str, List[Giveaway]]) -> Dict[str, List[Dict]]:
+    """Queued giveaways in a form to send to coordinator"""
+    return {
+        tg_id: [dataclasses.asdict(giveaway) for giveaway in giveaways]
+        for tg_id, giveaways in queued.items()
+    }
+
+
+def load_deadlines(queued: Dict[str, List[Dict]]) -> int:
+    """Queue giveaways handed over by coordinator, return how many were queued"""
+    return sum(
+        deadlines.push(tg_id, Giveaway(**giveaway))
+        for tg_id, giveaways in queued.items()
+        for giveaway in giveaways
+    )
+
+
+class ShardStorage:
+    """Part of Telegram storage assigned to this worker"""
+
+    def __init__(self) -> None:
+        self.storage: Dict = {}
+        self.assigned = asyncio.Event()
+
+    async def assign(self, shard: Dict, new_users: List[str]) -> Dict[str, List[Giveaway]]:
+        """Switch to a new shard right away, return deadlines of users moved out"""
+        self.storage = shard
+        queued = deadlines.export()
+        moved = deadlines.discard(tg_id for tg_id in queued if tg_id not in shard)
+        # only users new to the bot are told it starts working for them
+        await sgbot.sync_users(self, set(new_users))
+        self.assigned.set()
+        return moved
+
+
+class Channel:
+    """Worker's connection to coordinator"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self._grants: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+
+    async def send(self, message: Dict) -> None:
+        """Send a message to coordinator"""
+        await ipc.send(self.writer, message)
+
+    async def acquire(self) -> None:
+        """Wait for a slot granted by shared rate limiter"""
+        request_id = next(self._ids)
+        grant = asyncio.get_running_loop().create_future()
+        self._grants[request_id] = grant
+        await self.send({"type": "acquire", "id": request_id})
+        try:
+            await grant
+        finally:
+            self._grants.pop(request_id, None)
+
+    async def send_message(self, user_id: str, text: str) -> None:
+        """Forward a Telegram notification to coordinator"""
+        await self.send({"type": "notify", "user_id": user_id, "text": text})
+
+    async def listen(self, storage: ShardStorage) -> None:
+        """Process coordinator's messages until it disconnects"""
+        while message := await ipc.receive(self.reader):
+            if message["type"] == "users":
+                moved = await storage.assign(message["storage"], message.get("new", []))
+                logging.info(f"Got {len(storage.storage)} users assigned")
+                if moved:
+                    await self.send({"type": "deadlines", "deadlines": dump_deadlines(moved)})
+            elif message["type"] == "deadlines":
+                queued = load_deadlines(message["deadlines"])
+                logging.info(f"Got {queued} giveaways to enter before deadline handed over")
+            elif message["type"] == "grant":
+                grant = self._grants.get(message["id"])
+                if grant and not grant.done():
+                    grant.set_result(None)
+
+        raise ConnectionError("Coordinator has closed connection")
+
+    async def sync_statuses(self) -> None:
+        """Periodically share users' statuses, queued deadlines and metrics
+
+        Coordinator hands the deadlines over to other workers if this one leaves.
+        """
+        while True:
+            await asyncio.sleep(STATUS_SYNC_INTERVAL)
+            await self.send(
+                {
+                    "type": "status",
+                    "statuses": statuses.export(),
+                    "deadlines": dump_deadlines(deadlines.export()),
+                    "metrics": metrics.export(),
+                }
+            )
+
+
+class SharedRateLimiter(rate_limit.RateLimiter):
+    """Rate limiter asking coordinator for request slots"""
+
+    def __init__(self, channel: Channel) -> None:
+        super().__init__()
+        self.channel = channel
+
+    async def acquire(self) -> None:
+        await self.channel.acquire()
+
+
+async def serve(socket_path: str, name: str) -> None:
+    """Connect to coordinator and enter giveaways for assigned users"""
+    reader, writer = await asyncio.open_unix_connection(socket_path, limit=ipc.MESSAGE_LIMIT)
+    channel = Channel(reader, writer)
+    storage = ShardStorage()
+
+    config.bot = channel
+    rate_limit.set_limiter(SharedRateLimiter(channel))
+    profiling.install_signal_handler()
+    await channel.send({"type": "hello", "worker": name})
+
+    try:
+        async with TaskGroup() as tgroup:
+            tgroup.create_task(channel.listen(storage))
+            tgroup.create_task(channel.sync_statuses())
+            # don't start with an empty shard, or the first cycle is wasted
+            await storage.assigned.wait()
+            # users are applied by the channel as soon as a shard arrives
+            tgroup.create_task(sgbot.start_gw_entering())
+            tgroup.create_task(sgbot.start_deadline_entering())
+    finally:
+        writer.close()
+        logging.warning(f"Worker {name} exiting...")
+
+
+def run(socket_path: str, name: str, log_level: str = "WARNING") -> None:
+    """Process entry point of a worker"""
+    logging.basicConfig(
+        format=f"[%(asctime)s] %(levelname)s | {name} %(module)s: %(message)s",
+        level=log_level,
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    asyncio.run(serve(socket_path, name))
+
+
+if __name__ == "__main__":
+    run(sys.argv[1], sys.argv[2])
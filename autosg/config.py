@@ -3,3 +3,4 @@
 from aiogram import Bot
 
 bot: Bot
+ADMIN_ID: str = ""
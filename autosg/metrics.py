@@ -0,0 +1,258 @@
+"""Counters and latency histograms for crawling and entering pipeline.
+
+Metrics are exposed in Prometheus text format on a local HTTP endpoint
+and summarized for bot admin in Telegram. In multi-process mode workers
+export their metrics to the coordinator, which reports them combined.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+    from tenacity import RetryCallState
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+METRICS_HOST = "127.0.0.1"
+
+_registry: List[_Metric] = []
+
+
+def _labels_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    """Hashable key of label values"""
+    return tuple(sorted((name, str(label)) for name, label in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    """Render labels as {name="value",...}"""
+    pairs = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base of named metric with labeled values"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Tuple[Tuple[str, str], ...], Any] = {}
+        # latest values exported by other processes, by source
+        self._remote: Dict[str, Dict[Tuple[Tuple[str, str], ...], Any]] = {}
+        _registry.append(self)
+
+    @staticmethod
+    def _combine(first: Any, second: Any) -> Any:
+        """Sum of two values for the same labels"""
+        return first + second
+
+    def _merged(self) -> Dict[Tuple[Tuple[str, str], ...], Any]:
+        """Own values combined with ones of other processes"""
+        if not self._remote:
+            return self._values
+        merged = dict(self._values)
+        for values in self._remote.values():
+            for key, value in values.items():
+                merged[key] = self._combine(merged[key], value) if key in merged else value
+        return merged
+
+    def export(self) -> List:
+        """Own values in a JSON friendly form"""
+        return [[[list(label) for label in key], value] for key, value in self._values.items()]
+
+    def merge(self, source: str, exported: List) -> None:
+        """Replace values of another process with its latest export"""
+        self._remote[source] = {
+            tuple(tuple(label) for label in key): value for key, value in exported
+        }
+
+    def render(self) -> List[str]:
+        """Lines of Prometheus text format for the metric"""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increase counter for given labels"""
+        key = _labels_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Value for given labels"""
+        return self._merged().get(_labels_key(labels), 0)
+
+    def total(self) -> float:
+        """Sum over all labels"""
+        return sum(self._merged().values())
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in self._merged().items():
+            lines.append(f"{self.name}{_format_labels(labels)} {value:g}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation)
+        self.buckets = buckets
+
+    @staticmethod
+    def _combine(first: List[float], second: List[float]) -> List[float]:
+        return [own + other for own, other in zip(first, second)]
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Account an observed value for given labels"""
+        key = _labels_key(labels)
+        # per bucket counts followed by +Inf count and sum
+        counts = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe time spent in a block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self) -> int:
+        """Number of observations over all labels"""
+        return int(sum(sum(counts[:-1]) for counts in self._merged().values()))
+
+    def mean(self) -> float:
+        """Mean of observations over all labels"""
+        count = self.count()
+        return sum(counts[-1] for counts in self._merged().values()) / count if count else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, counts in self._merged().items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                bound_label = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labels, bound_label)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {counts[-1]:g}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+pages_fetched = Counter("sg_pages_fetched_total", "SteamGifts pages fetched per user")
+fetch_latency = Histogram("sg_fetch_seconds", "Time to fetch a SteamGifts page")
+parse_latency = Histogram("sg_parse_seconds", "Time to parse a SteamGifts page")
+throttle_wait = Histogram("sg_throttle_wait_seconds", "Time spent waiting for throttle")
+retries = Counter("sg_retries_total", "Retries made by tenacity decorators")
+entries = Counter("sg_entries_total", "Giveaway entry attempts by result")
+entries_per_cycle = Histogram(
+    "sg_entries_per_cycle", "Giveaways entered in a user's run", (0, 1, 2, 5, 10, 20, 50, 100)
+)
+points_burned = Counter("sg_points_burned_total", "Points spent while burning")
+steamspy_latency = Histogram("sg_steamspy_seconds", "Time to get SteamSpy votes for a game")
+ranking_latency = Histogram("sg_ranking_seconds", "Time to rank burn candidates by their votes")
+notifications_sent = Counter("tg_notifications_total", "Notifications sent by kind")
+notification_latency = Histogram("tg_notification_seconds", "Time to send a notification")
+user_run_latency = Histogram("sg_user_run_seconds", "Duration of a user's run")
+user_errors = Counter("sg_user_errors_total", "Runs aborted by unhandled errors")
+
+
+def count_retry(retry_state: RetryCallState) -> None:
+    """Tenacity before_sleep hook to count retries per function"""
+    name = retry_state.fn.__name__ if retry_state.fn else "unknown"
+    retries.inc(function=name)
+
+
+def export() -> Dict[str, List]:
+    """Values of all metrics to share with another process"""
+    return {metric.name: metric.export() for metric in _registry}
+
+
+def merge(source: str, exported: Dict[str, List]) -> None:
+    """Account metrics exported by another process, e.g. a worker"""
+    for metric in _registry:
+        if metric.name in exported:
+            metric.merge(source, exported[metric.name])
+
+
+def render() -> str:
+    """All metrics in Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def summary() -> str:
+    """Short human readable metrics digest"""
+    return "\n".join(
+        [
+            f"Pages fetched: {pages_fetched.total():g}",
+            f"Fetch latency: {fetch_latency.mean():.2f}s avg",
+            f"Parse latency: {parse_latency.mean():.3f}s avg",
+            f"Throttle wait: {throttle_wait.mean():.1f}s avg",
+            f"Retries: {retries.total():g}",
+            f"Entries: {entries.total():g} attempts, "
+            f"{entries.value(result='success'):g} successful",
+            f"Points burned: {points_burned.total():g}, "
+            f"ranking {ranking_latency.mean():.1f}s avg",
+            f"SteamSpy lookups: {steamspy_latency.count()}, {steamspy_latency.mean():.2f}s avg",
+            f"Notifications: {notifications_sent.total():g}",
+            f"User runs: {user_run_latency.count()}, {user_run_latency.mean():.0f}s avg, "
+            f"{user_errors.total():g} failed",
+        ]
+    )
+
+
+async def _handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Answer any HTTP request with metrics"""
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\n".encode()
+            + b"Connection: close\r\n\r\n"
+            + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: Optional[int]) -> None:
+    """Serve metrics on a local port until cancelled, do nothing if no port"""
+    if not port:
+        return
+
+    server = await asyncio.start_server(_handle_request, METRICS_HOST, port)
+    logging.info(f"Serving metrics on {METRICS_HOST}:{port}")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,206 @@
+"""On-demand CPU and allocation profiling of the live process.
+
+A profile is started by SIGUSR1 or by /profile command of bot admin and
+runs for a bounded window. A sampler thread periodically reads stacks of
+all threads, attributing event loop samples to the running task, while
+tracemalloc compares memory before and after the window. The report is
+written to PROFILE_DIR. Nothing is sampled or traced while it is off.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from types import FrameType
+    from typing import List, Optional, Set, Tuple
+
+
+PROFILE_DIR = "profiles"
+PROFILE_WINDOW = 30
+MAX_PROFILE_WINDOW = 300
+SAMPLE_INTERVAL = 0.005
+TRACEMALLOC_FRAMES = 10
+REPORT_TOP = 25
+
+IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+_running: Set[asyncio.Task] = set()
+
+
+def _frame_key(frame: FrameType) -> str:
+    """Readable location of a frame's function"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+@dataclass
+class SampleStats:
+    """Samples counted by task and by function"""
+
+    ticks: int = 0
+    samples: int = 0
+    idle: int = 0
+    tasks: Counter[str] = field(default_factory=Counter)
+    own: Counter[str] = field(default_factory=Counter)
+    total: Counter[str] = field(default_factory=Counter)
+
+
+class Sampler(threading.Thread):
+    """Thread sampling stacks of other threads at a fixed interval"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = SAMPLE_INTERVAL) -> None:
+        super().__init__(name="profiler", daemon=True)
+        self.loop = loop
+        self.interval = interval
+        self.loop_thread = threading.get_ident()
+        self.stats = SampleStats()
+        self._stop_event = threading.Event()
+
+    def _owner(self, thread_id: int) -> str:
+        """Name of a task or a thread a sample belongs to"""
+        if thread_id != self.loop_thread:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            return f"thread {names.get(thread_id, thread_id)}"
+
+        task = asyncio.current_task(self.loop)
+        return task.get_name() if task else "event loop"
+
+    def _sample(self) -> None:
+        """Record stacks of all threads but the sampler"""
+        self.stats.ticks += 1
+        for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if thread_id == self.ident:
+                continue
+
+            self.stats.samples += 1
+            if os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                self.stats.idle += 1
+                continue
+
+            self.stats.tasks[self._owner(thread_id)] += 1
+            self.stats.own[_frame_key(frame)] += 1
+            seen = set()
+            current: Optional[FrameType] = frame
+            while current:
+                key = _frame_key(current)
+                if key not in seen:
+                    seen.add(key)
+                    self.stats.total[key] += 1
+                current = current.f_back
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the thread to finish"""
+        self._stop_event.set()
+        self.join()
+
+
+def _format_counter(title: str, counter: Counter[str], samples: int) -> List[str]:
+    """Render most common entries of a counter with their share of samples"""
+    lines = [title]
+    for name, count in counter.most_common(REPORT_TOP):
+        lines.append(f"{count:8} {100 * count / max(samples, 1):6.1f}%  {name}")
+    return lines + [""]
+
+
+def _format_report(
+    sampler: Sampler, allocations: List[tracemalloc.StatisticDiff], window: float
+) -> str:
+    """Render profiling results as plain text"""
+    stats = sampler.stats
+    busy = stats.samples - stats.idle
+    # the sampler thread waits for the GIL, so under load it falls behind
+    rate = stats.ticks / window if window else 0
+    lines = [
+        f"Profile of pid {os.getpid()} over {window:.1f}s, "
+        f"{stats.samples} samples in {stats.ticks} rounds, {stats.idle} idle",
+        f"Sampled {rate:.1f} times a second, one round every "
+        f"{1000 / rate if rate else 0:.0f}ms ({sampler.interval * 1000:.0f}ms requested)",
+        "",
+    ]
+    lines += _format_counter("Busy samples by task:", stats.tasks, busy)
+    lines += _format_counter("Busy samples by function (own):", stats.own, busy)
+    lines += _format_counter("Busy samples by function (total):", stats.total, busy)
+    lines.append("Memory allocated during the window (by line):")
+    lines += [str(stat) for stat in allocations[:REPORT_TOP]]
+    return "\n".join(lines) + "\n"
+
+
+def _write_report(report: str) -> str:
+    """Save a report to a new file and return its path"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(
+        PROFILE_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.txt"
+    )
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(report)
+    return path
+
+
+async def profile(seconds: float = PROFILE_WINDOW) -> Tuple[str, str]:
+    """Profile the process for a window, return report and its file path"""
+    window = min(max(seconds, 1), MAX_PROFILE_WINDOW)
+    own_tracing = not tracemalloc.is_tracing()
+    if own_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    before = tracemalloc.take_snapshot()
+
+    sampler = Sampler(asyncio.get_running_loop())
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        await asyncio.sleep(window)
+    finally:
+        await asyncio.to_thread(sampler.stop)
+        after = tracemalloc.take_snapshot()
+        if own_tracing:
+            tracemalloc.stop()
+
+    # don't report memory taken by tracemalloc itself
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    allocations = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    )
+    report = _format_report(sampler, allocations, time.perf_counter() - started)
+    path = await asyncio.to_thread(_write_report, report)
+    logging.warning(f"Profile written to {path}")
+    return report, path
+
+
+def is_running() -> bool:
+    """Check if a profile is being taken"""
+    return bool(_running)
+
+
+def start_profile(seconds: float = PROFILE_WINDOW) -> Optional[asyncio.Task]:
+    """Start profiling in background unless it is already running"""
+    if _running:
+        logging.warning("Profiling is already running")
+        return None
+
+    task = asyncio.create_task(profile(seconds), name="profiler")
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return task
+
+
+def install_signal_handler() -> None:
+    """Start profiling with default window on SIGUSR1"""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, start_profile)
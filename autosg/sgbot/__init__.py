@@ -1,8 +1,38 @@
 """
 Implements interaction with SteamGifts site.
+
+Only section list is loaded eagerly, the rest pulls in HTML parsing and
+HTTP client and is imported on first use to keep bot startup fast.
 """
 
-from .sg_interface import SECTION_URLS, verify_token
-from .sgbot import start_gw_entering, user_status
+import importlib
+
+from .sections import SECTION_URLS
+
+_LAZY_ATTRIBUTES = {
+    "verify_token": ".sg_interface",
+    "start_gw_entering": ".sgbot",
+    "sync_users": ".sgbot",
+    "start_deadline_entering": ".sgbot",
+    "user_status": ".sgbot",
+    "submit_token": ".token_verifier",
+    "start_token_verification": ".token_verifier",
+}
+
+__all__ = ["SECTION_URLS", *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name: str):
+    """Import heavy parts of the package on first access"""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = ["verify_token", "start_gw_entering", "SECTION_URLS", "user_status"]
+def preload() -> None:
+    """Import everything lazy attributes need"""
+    for module in set(_LAZY_ATTRIBUTES.values()):
+        importlib.import_module(module, __name__)
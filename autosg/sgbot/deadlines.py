@@ -0,0 +1,101 @@
+"""Time-ordered queue of giveaways users want but did not enter yet.
+
+Crawls push giveaways ending before user's next run, scheduler wakes users
+shortly before each deadline to try entering with regenerated points.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+    from .sg_interface import Giveaway
+
+
+DEADLINE_LEAD = 600
+
+
+class DeadlineQueue:
+    """Heap of (end time, user, giveaway) entries"""
+
+    def __init__(self, lead: int = DEADLINE_LEAD) -> None:
+        self.lead = lead
+        self._heap: List[Tuple[int, int, str, Giveaway]] = []
+        self._queued: Set[Tuple[str, str]] = set()
+        self._counter = 0
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, tg_id: str, giveaway: Giveaway) -> bool:
+        """Queue a giveaway for a user unless it is already queued or over"""
+        if (tg_id, giveaway.code) in self._queued or giveaway.end_time <= time.time():
+            return False
+
+        wakes_earlier = not self._heap or giveaway.end_time < self._heap[0][0]
+        self._counter += 1
+        heapq.heappush(
+            self._heap, (giveaway.end_time, self._counter, tg_id, giveaway)
+        )
+        self._queued.add((tg_id, giveaway.code))
+        if wakes_earlier:
+            self._changed.set()
+        return True
+
+    def next_wake(self) -> Optional[float]:
+        """Time when the earliest queued giveaway should be entered"""
+        if not self._heap:
+            return None
+        return self._heap[0][0] - self.lead
+
+    def pop_due(self, now: float) -> Dict[str, List[Giveaway]]:
+        """Take giveaways to be entered by now grouped by user"""
+        due: Dict[str, List[Giveaway]] = {}
+        while self._heap and self._heap[0][0] - self.lead <= now:
+            end_time, _, tg_id, giveaway = heapq.heappop(self._heap)
+            self._queued.discard((tg_id, giveaway.code))
+            if end_time > now:
+                due.setdefault(tg_id, []).append(giveaway)
+        return due
+
+    def export(self) -> Dict[str, List[Giveaway]]:
+        """Queued giveaways grouped by user, leaving them queued"""
+        queued: Dict[str, List[Giveaway]] = {}
+        for _, _, tg_id, giveaway in self._heap:
+            queued.setdefault(tg_id, []).append(giveaway)
+        return queued
+
+    def discard(self, tg_ids: Iterable[str]) -> Dict[str, List[Giveaway]]:
+        """Remove giveaways of given users and return them grouped by user"""
+        tg_ids = set(tg_ids)
+        removed: Dict[str, List[Giveaway]] = {}
+        kept = []
+        for item in self._heap:
+            if item[2] in tg_ids:
+                removed.setdefault(item[2], []).append(item[3])
+                self._queued.discard((item[2], item[3].code))
+            else:
+                kept.append(item)
+        if removed:
+            heapq.heapify(kept)
+            self._heap = kept
+        return removed
+
+    async def wait(self) -> None:
+        """Sleep until the next deadline is due or an earlier one is queued"""
+        self._changed.clear()
+        next_wake = self.next_wake()
+        timeout = None if next_wake is None else max(0, next_wake - time.time())
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except TimeoutError:
+            pass
+
+
+deadlines = DeadlineQueue()
@@ -0,0 +1,121 @@
+"""Selects giveaways to enter to get the most out of user's points.
+
+Value of an entry is its win probability weighted by game rating. Odds
+are taken against entries projected to the giveaway's end, not entries
+so far, so fresh long running giveaways don't look like sure wins.
+Selection is a 0/1 knapsack over points budget.
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+    from .sg_interface import Giveaway
+
+
+# entry rate assumed before a giveaway has run long enough to measure one
+PRIOR_ENTRIES = 20
+PRIOR_WINDOW = 3600
+
+
+def projected_entries(giveaway: Giveaway, now: Optional[float] = None) -> float:
+    """Estimate entries a giveaway will have by its end, our entry included
+
+    Remaining time is filled at the rate entries came since creation,
+    smoothed with a prior rate while the giveaway is young.
+    """
+    now = time.time() if now is None else now
+    entries = giveaway.entries + 1
+    if not 0 < giveaway.start_time <= now < giveaway.end_time:
+        return entries
+
+    rate = (giveaway.entries + PRIOR_ENTRIES) / (now - giveaway.start_time + PRIOR_WINDOW)
+    return entries + rate * (giveaway.end_time - now)
+
+
+def win_probability(giveaway: Giveaway, now: Optional[float] = None) -> float:
+    """Estimate chance to win a giveaway if entered now"""
+    return min(1.0, giveaway.copies / projected_entries(giveaway, now))
+
+
+def entry_value(
+    giveaway: Giveaway, rating: float = 1.0, now: Optional[float] = None
+) -> float:
+    """Expected value of entering a giveaway"""
+    return win_probability(giveaway, now) * rating
+
+
+def select_entries(
+    giveaways: Iterable[Giveaway],
+    budget: int,
+    ratings: Optional[Dict[str, float]] = None,
+) -> List[Giveaway]:
+    """Pick giveaways with the most total value within points budget
+
+    Ratings are looked up by steam_id, missing ones count as 1.
+    Selected giveaways are returned most valuable first.
+    """
+    ratings = ratings or {}
+    now = time.time()
+    values = {}
+    items = []
+    for giveaway in giveaways:
+        if giveaway.code in values or not 0 < giveaway.cost <= budget:
+            continue
+        values[giveaway.code] = entry_value(giveaway, ratings.get(giveaway.steam_id, 1.0), now)
+        items.append(giveaway)
+
+    if budget <= 0 or not items:
+        return []
+
+    # best[points] is the most value reachable spending at most points,
+    # taken[i][points] marks if item i is a part of that best choice
+    best = [0.0] * (budget + 1)
+    taken = []
+    for giveaway in items:
+        value = values[giveaway.code]
+        row = bytearray(budget + 1)
+        for points in range(budget, giveaway.cost - 1, -1):
+            candidate = best[points - giveaway.cost] + value
+            if candidate > best[points]:
+                best[points] = candidate
+                row[points] = 1
+        taken.append(row)
+
+    selected = []
+    points = budget
+    for i in range(len(items) - 1, -1, -1):
+        if taken[i][points]:
+            selected.append(items[i])
+            points -= items[i].cost
+
+    return sorted(selected, key=lambda giveaway: values[giveaway.code], reverse=True)
+
+
+class TopK:
+    """Keeps K items with the highest scores out of a stream"""
+
+    def __init__(self, k: int) -> None:
+        self.k = k
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __iter__(self) -> Iterator[Any]:
+        return (item for _, _, item in self._heap)
+
+    def push(self, score: float, item: Any) -> None:
+        """Offer an item, dropping the lowest scored one if full"""
+        self._counter += 1
+        entry = (score, self._counter, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
@@ -0,0 +1,39 @@
+"""Global pacing of requests to SteamGifts across all users.
+
+Per-session throttling keeps a single user's crawl polite, the global
+limiter caps the total request rate of the whole bot. In multi-process
+mode workers replace it with a limiter shared through the coordinator.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+
+SG_GLOBAL_INTERVAL = 1.0
+
+
+class RateLimiter:
+    """Lets one request through per interval, in order of arrival"""
+
+    def __init__(self, interval: float = SG_GLOBAL_INTERVAL) -> None:
+        self.interval = interval
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        """Wait for a slot to make a request"""
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+limiter = RateLimiter()
+
+
+def set_limiter(new_limiter: RateLimiter) -> None:
+    """Replace global limiter, e.g. with one shared between processes"""
+    global limiter  # pylint: disable=global-statement
+    limiter = new_limiter
@@ -0,0 +1,11 @@
+"""SteamGifts sections users can select, kept apart from heavy site interface"""
+
+SECTION_URLS = {
+    "Wishlist": "search?page=%d&type=wishlist",
+    "Recommended": "search?page=%d&type=recommended",
+    "Copies": "search?page=%d&copy_min=2",
+    "DLC": "search?page=%d&dlc=true",
+    "Group": "search?page=%d&type=group",
+    "New": "search?page=%d&type=new",
+    "All": "search?page=%d",
+}
@@ -0,0 +1,99 @@
+"""Lazily created SteamGifts sessions with LRU cap on live ones.
+
+Users keep only a small SessionState between runs. A session is opened
+when a user needs it and released once the user's run is over. Idle
+sessions are also closed when there are more than the cap, saving their
+state back to the user.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from . import sg_interface as sg
+
+if TYPE_CHECKING:
+    from typing import Callable, Dict, Set
+
+
+MAX_LIVE_SESSIONS = 8
+
+
+class SessionPool:
+    """Registry of live sessions ordered by last use"""
+
+    def __init__(self, limit: int = MAX_LIVE_SESSIONS) -> None:
+        self.limit = limit
+        self._sessions: OrderedDict[str, sg.SteamGiftsSession] = OrderedDict()
+        self._states: Dict[str, sg.SessionState] = {}
+        self._busy: Dict[str, Callable[[], bool]] = {}
+        self._closing: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(
+        self, tg_id: str, token: str, busy: Callable[[], bool] = lambda: False
+    ) -> sg.SteamGiftsSession:
+        """Return user's live session, opening it from saved state if needed"""
+        session = self._sessions.get(tg_id)
+        if session:
+            self._sessions.move_to_end(tg_id)
+            return session
+
+        session = sg.SteamGiftsSession(tg_id, token, self._states.pop(tg_id, None))
+        self._sessions[tg_id] = session
+        self._busy[tg_id] = busy
+        logging.debug(f"{tg_id}: session opened, {len(self._sessions)} live")
+        self._evict()
+        return session
+
+    def set_token(self, tg_id: str, token: str) -> None:
+        """Switch user's live session to an updated token"""
+        if tg_id in self._sessions:
+            self._sessions[tg_id].set_token(token)
+        elif tg_id in self._states:
+            self._states[tg_id].xsrf_token = None
+
+    def _evict(self) -> None:
+        """Close least recently used idle sessions above the cap"""
+        excess = len(self._sessions) - self.limit
+        # the most recent session has just been handed out
+        for tg_id in list(self._sessions)[:-1]:
+            if excess <= 0:
+                break
+            if self._busy[tg_id]():
+                continue
+
+            session = self._sessions.pop(tg_id)
+            del self._busy[tg_id]
+            self._states[tg_id] = session.export_state()
+            task = asyncio.create_task(session.session.close())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            logging.debug(f"{tg_id}: session evicted, {len(self._sessions)} live")
+            excess -= 1
+
+    async def release(self, tg_id: str) -> None:
+        """Close user's session keeping its state for the next run"""
+        session = self._sessions.pop(tg_id, None)
+        self._busy.pop(tg_id, None)
+        if session:
+            self._states[tg_id] = await session.close()
+            logging.debug(f"{tg_id}: session closed, {len(self._sessions)} live")
+
+    async def discard(self, tg_id: str) -> None:
+        """Close user's session and forget its state"""
+        await self.release(tg_id)
+        self._states.pop(tg_id, None)
+
+    async def close_all(self) -> None:
+        """Close all live sessions"""
+        for tg_id in list(self._sessions):
+            await self.release(tg_id)
+
+
+sessions = SessionPool()
@@ -7,83 +7,101 @@ import json
 import logging
 import random
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
 from bs4 import BeautifulSoup
-from curl_cffi.requests import AsyncSession
 from tenacity import retry
 from tenacity.stop import stop_after_attempt
 from tenacity.wait import wait_fixed, wait_random
 
+from autosg import metrics
+
+from . import rate_limit, transport
+from .sections import SECTION_URLS
+from .snapshots import snapshots
+
 if TYPE_CHECKING:
-    from typing import AsyncGenerator, Generator, Optional
+    from typing import Any, AsyncGenerator, Dict, Generator, Iterable, List, Optional
+
+    from tenacity import RetryCallState
 
 
 SG_URL = "https://www.steamgifts.com/"
 VERIFY_URL = SG_URL + "account/settings/profile"
-SECTION_URLS = {
-    "Wishlist": "search?page=%d&type=wishlist",
-    "Recommended": "search?page=%d&type=recommended",
-    "Copies": "search?page=%d&copy_min=2",
-    "DLC": "search?page=%d&dlc=true",
-    "Group": "search?page=%d&type=group",
-    "New": "search?page=%d&type=new",
-    "All": "search?page=%d",
-}
 SG_THROTTLE = 10
-SG_ENTRY_DELAY = 20
+SG_JITTER = 3
+ENTRY_CONCURRENCY = 3
 
 
-async def verify_token(token: str, session: Optional[AsyncSession] = None) -> bool:
+async def verify_token(token: str, session: Optional[Any] = None) -> bool:
     """Verify user-provided SteamGifts token"""
     if not session:
-        async with AsyncSession(impersonate="chrome124") as session:
+        async with transport.new_session() as session:
             session.cookies.set("PHPSESSID", token)
             return await _verify_token(session)
 
     return await _verify_token(session)
 
 
-@retry(stop=stop_after_attempt(5), wait=wait_fixed(10) + wait_random(10, 30))
-async def _verify_token(session: AsyncSession) -> bool:
+@retry(
+    stop=stop_after_attempt(5),
+    wait=wait_fixed(10) + wait_random(10, 30),
+    before_sleep=metrics.count_retry,
+)
+async def _verify_token(session: Any) -> bool:
     """Helper to verify user-provided SteamGifts token using existing session"""
     resp = await session.get(VERIFY_URL)
     return len(resp.history) == 0
 
 
+def _parse_int(text: str, default: int = 0) -> int:
+    """Get integer from a text like '1,234 entries' or 'Level 5+'"""
+    digits = "".join(char for char in text if char.isdigit())
+    return int(digits) if digits else default
+
+
 def _get_giveaway_from_soup(soup: BeautifulSoup) -> Giveaway:
     """Get givwaway info from a giveaway soup"""
-    giveaway = Giveaway()
+    parsed = {}
     # Fix: handle soup None return value in a proper way
     try:
-        giveaway.cost = int(
-            soup.find_all("span", class_="giveaway__heading__thin")[-1].text.strip(
-                "(P)"
-            )
-        )
-
-        giveaway.name = soup.find("a", class_="giveaway__heading__name").text
-
-        giveaway.code = soup.find("a", class_="giveaway__heading__name")["href"].split(
-            "/"
-        )[2]
+        heading_thin = soup.find_all("span", class_="giveaway__heading__thin")
+        parsed["cost"] = int(heading_thin[-1].text.strip("(P)"))
+        if len(heading_thin) > 1 and "Cop" in heading_thin[0].text:
+            parsed["copies"] = _parse_int(heading_thin[0].text, 1)
+
+        heading_name = soup.find("a", class_="giveaway__heading__name")
+        parsed["name"] = heading_name.text
+        parsed["code"] = heading_name["href"].split("/")[2]
         try:
-            giveaway.steam_id = (
-                soup.find("a", target="_blank")["href"].split("/")[-1].split("?")[0]
-            )
+            # store links look like .../app/{steam_id}/
+            href = soup.find("a", target="_blank")["href"]
+            parsed["steam_id"] = href.split("?")[0].rstrip("/").split("/")[-1]
 
-            int(giveaway.steam_id)
+            int(parsed["steam_id"])
         except Exception:
             logging.warning(
-                f'''Couldn't parse steam_id from {soup.find("a", target="_blank")} for {giveaway.name} ({giveaway.code})'''
+                f'''Couldn't parse steam_id from {soup.find("a", target="_blank")} for {parsed["name"]} ({parsed["code"]})'''
             )
 
-        logging.debug(f"{giveaway}")
+        links = soup.find("div", class_="giveaway__links")
+        if links and links.find("span"):
+            parsed["entries"] = _parse_int(links.find("span").text)
+
+        # end time goes first, creation time second
+        timestamps = soup.find_all("span", attrs={"data-timestamp": True})
+        if timestamps:
+            parsed["end_time"] = int(timestamps[0]["data-timestamp"])
+        if len(timestamps) > 1:
+            parsed["start_time"] = int(timestamps[1]["data-timestamp"])
+
+        giveaway = Giveaway(**parsed)
+        logging.debug("%s", giveaway)
         return giveaway
 
     except Exception:
-        logging.error(f"Failed to parse giveaway: \n {soup.prettify()}")
+        logging.error(f"Failed to parse giveaway {parsed.get('code', '')}")
         raise
 
 
@@ -98,42 +116,131 @@ def _get_giveaways_from_soup_page(
         yield _get_giveaway_from_soup(item)
 
 
-@dataclass
-class Giveaway:
-    """Giveaway parameters object"""
+@dataclass(frozen=True, slots=True)
+class Giveaway:  # pylint: disable=too-many-instance-attributes
+    """Giveaway parameters object, identified by its code"""
 
     code: str = ""
-    name: str = ""
-    cost: int = 0
-    steam_id: str = ""
+    name: str = field(default="", compare=False)
+    cost: int = field(default=0, compare=False)
+    steam_id: str = field(default="", compare=False)
+    entries: int = field(default=0, compare=False)
+    copies: int = field(default=1, compare=False)
+    end_time: int = field(default=0, compare=False)
+    start_time: int = field(default=0, compare=False)
+
+
+@dataclass
+class SessionState:
+    """Small serializable part of a session to carry between runs"""
+
+    cookies: Dict[str, str] = field(default_factory=dict)
+    xsrf_token: Optional[str] = None
+    points: Optional[int] = None
+    next_call: float = 0
+
+
+def _export_cookies(cookies: Any) -> Dict[str, str]:
+    """Plain name to value mapping of session cookies"""
+    jar = getattr(cookies, "jar", None)
+    if jar is None:
+        return dict(cookies)
+    return {cookie.name: cookie.value for cookie in jar}
+
+
+def _snapshot_failed_update(retry_state: RetryCallState) -> Any:
+    """Store the last fetched page once all session update attempts failed"""
+    session = retry_state.args[0]
+    if session._page[1]:  # pylint: disable=protected-access
+        snapshot_id = session._snapshot_page()  # pylint: disable=protected-access
+        logging.error(f"{session.tg_id}: failed to update session, page snapshot {snapshot_id}")
+    return retry_state.outcome.result()
+
+
+@dataclass
+class EntryBatch:
+    """Outcome of entering a batch of giveaways"""
+
+    entered: List[Giveaway] = field(default_factory=list)
+    points: Optional[int] = None
+    stopped: str = ""
 
 
 class SteamGiftsSession:
     """SteamGifts interface to get info for a user identified by a token"""
 
-    def __init__(self, tg_id: str, token: str) -> None:
-        """Set necessary session properties"""
+    def __init__(
+        self, tg_id: str, token: str, state: Optional[SessionState] = None
+    ) -> None:
+        """Set necessary session properties, restoring a saved state if given"""
+        state = state or SessionState()
         self.tg_id = tg_id
-        self.session = AsyncSession(impersonate="chrome124")
+        self.session = transport.new_session()
+        for name, value in state.cookies.items():
+            self.session.cookies.set(name, value)
+        self.session.cookies.set("PHPSESSID", token)
+        self._xsrf_token = state.xsrf_token
+        self._points = state.points
+        self._page = ("", "")
+        self.next_call = state.next_call
+
+    def export_state(self) -> SessionState:
+        """State needed to resume the session after it is closed"""
+        return SessionState(
+            cookies=_export_cookies(self.session.cookies),
+            xsrf_token=self._xsrf_token,
+            points=self._points,
+            next_call=self.next_call,
+        )
+
+    async def close(self) -> SessionState:
+        """Close the session returning its state"""
+        state = self.export_state()
+        await self.session.close()
+        return state
+
+    def set_token(self, token: str) -> None:
+        """Switch session to an updated user's token"""
         self.session.cookies.set("PHPSESSID", token)
         self._xsrf_token = None
-        self._points = None
-        self.next_call = 0
 
-    @retry(stop=stop_after_attempt(5), wait=wait_fixed(10) + wait_random(5, 20))
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_fixed(10) + wait_random(5, 20),
+        before_sleep=metrics.count_retry,
+    )
     async def _get_soup_from_page(self, url: str) -> BeautifulSoup:
         """Fetch BS object from an URL"""
         # throttling page fetching with jitter to avoid bot-like fixed intervals
-        jitter = random.uniform(0, 3)
+        jitter = random.uniform(0, SG_JITTER)
         sleep_time = self.next_call + SG_THROTTLE + jitter - time.time()
         self.next_call = max(self.next_call + SG_THROTTLE, time.time())
+        metrics.throttle_wait.observe(max(0, sleep_time))
         await asyncio.sleep(sleep_time)
+        await rate_limit.limiter.acquire()
+
+        # don't let a failed fetch leave the previous page for snapshots
+        self._page = ("", "")
 
-        response = await self.session.get(url)
-        soup = BeautifulSoup(response.text, "html.parser")
+        with metrics.fetch_latency.time():
+            response = await self.session.get(url)
+        metrics.pages_fetched.inc(user=self.tg_id)
+        self._page = (url, response.text)
+        with metrics.parse_latency.time():
+            soup = BeautifulSoup(response.text, "html.parser")
         return soup
 
-    @retry(stop=stop_after_attempt(5), wait=wait_fixed(10) + wait_random(5, 30))
+    def _snapshot_page(self) -> str:
+        """Store the last fetched page for investigation, return snapshot ID"""
+        url, html = self._page
+        return snapshots.save(html, url)
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_fixed(10) + wait_random(5, 30),
+        before_sleep=metrics.count_retry,
+        retry_error_callback=_snapshot_failed_update,
+    )
     async def _update_session(self) -> None:
         """Get current user's parameters on SteamGifts
 
@@ -142,7 +249,7 @@ class SteamGiftsSession:
         soup = await self._get_soup_from_page(SG_URL)
         xsrf_input = soup.find("input", {"name": "xsrf_token"})
         if xsrf_input is None:
-            logging.error(f"{self.tg_id}: xsrf_token not found, page dump:\n{soup.prettify()}")
+            logging.warning(f"{self.tg_id}: xsrf_token not found in page")
             raise ValueError("xsrf_token input not found in page")
         self._xsrf_token = xsrf_input["value"]
         self._points = int(
@@ -174,31 +281,117 @@ class SteamGiftsSession:
                 )
                 break
 
-            for giveaway in _get_giveaways_from_soup_page(soup):
+            try:
+                giveaways = list(_get_giveaways_from_soup_page(soup))
+            except Exception:
+                snapshot_id = self._snapshot_page()
+                logging.error(
+                    f"{self.tg_id}: failed to parse page {page} of {section} section, "
+                    f"page snapshot {snapshot_id}"
+                )
+                raise
+
+            for giveaway in giveaways:
                 yield giveaway
 
             page += 1
 
-    async def enter_giveaway(self, giveaway: Giveaway) -> bool:
-        """Enter a game's giveaway"""
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_fixed(5) + wait_random(0, 5),
+        before_sleep=metrics.count_retry,
+        reraise=True,
+    )
+    async def _send_entry(self, payload: Dict) -> Any:
+        """Post entry_insert form once the rate limiter allows it
+
+        Responses of an overloaded or failing site are raised to be retried.
+        """
+        await rate_limit.limiter.acquire()
+        entry = await self.session.post(SG_URL + "ajax.php", data=payload)
+        if entry.status_code == 429 or entry.status_code >= 500:
+            raise ConnectionError(f"entry_insert answered with status {entry.status_code}")
+        return entry
+
+    async def _post_entry(self, giveaway: Giveaway) -> Optional[Dict]:
+        """Post entry_insert for a giveaway and return parsed response
+
+        None means the token has expired: the response is not JSON but a
+        page served with 200 or after a redirect, e.g. the login page.
+        Failures to get a usable response are raised.
+        """
         payload = {
             "xsrf_token": self._xsrf_token,
             "do": "entry_insert",
             "code": giveaway.code,
         }
 
-        entry = await self.session.post(SG_URL + "ajax.php", data=payload)
+        entry = await self._send_entry(payload)
         try:
             json_data = json.loads(entry.text)
-            if json_data["type"] == "success":
-                await asyncio.sleep(SG_ENTRY_DELAY)
-                return True
+        except ValueError:
+            json_data = None
+        if isinstance(json_data, dict):
+            return json_data
+
+        self._page = (SG_URL + "ajax.php", entry.text)
+        snapshot_id = self._snapshot_page()
+        if entry.status_code != 200 and not entry.history:
+            raise ValueError(
+                f"entry response is not json, status {entry.status_code}, response snapshot {snapshot_id}"
+            )
 
-            if json_data["msg"] != "Previously Won":
-                logging.warning(f"{self.tg_id}: entry error: {json_data['msg']}")
+        metrics.entries.inc(result="invalid")
+        logging.error(f"{self.tg_id}: entry response is not json, response snapshot {snapshot_id}")
+        return None
 
-            return False
+    async def enter_giveaways(
+        self, giveaways: Iterable[Giveaway], concurrency: Optional[int] = None
+    ) -> EntryBatch:
+        """Enter a planned batch of giveaways
 
-        except Exception:
-            logging.error(f"{self.tg_id}: could not parse json: \n {entry.text}")
-            raise
+        Entries are posted by a few concurrent tasks paced by the global
+        rate limiter. The rest of the batch is cancelled once SteamGifts
+        reports lack of points or the response shows the token has expired.
+        """
+        batch = EntryBatch()
+        slots = asyncio.Semaphore(concurrency or ENTRY_CONCURRENCY)
+
+        async def enter(giveaway: Giveaway) -> None:
+            async with slots:
+                if batch.stopped:
+                    return
+                try:
+                    json_data = await self._post_entry(giveaway)
+                except Exception:
+                    metrics.entries.inc(result="failed")
+                    logging.exception(f"{self.tg_id}: failed to post entry for {giveaway.code}, skipping")
+                    return
+                if json_data is None:
+                    batch.stopped = batch.stopped or "token_expired"
+                    return
+
+            if json_data.get("type") == "success":
+                metrics.entries.inc(result="success")
+                batch.entered.append(giveaway)
+                if "points" in json_data:
+                    # responses of concurrent posts may arrive out of order
+                    points = _parse_int(str(json_data["points"]))
+                    batch.points = points if batch.points is None else min(batch.points, points)
+                    self._points = batch.points
+                return
+
+            metrics.entries.inc(result="error")
+            msg = json_data.get("msg", "")
+            if msg == "Not Enough Points":
+                batch.stopped = batch.stopped or "out_of_points"
+            elif msg != "Previously Won":
+                logging.warning(f"{self.tg_id}: entry error: {msg}")
+
+        async with asyncio.TaskGroup() as tgroup:
+            for giveaway in giveaways:
+                tgroup.create_task(enter(giveaway))
+
+        if batch.stopped:
+            logging.info(f"{self.tg_id}: entry batch stopped: {batch.stopped}")
+        return batch
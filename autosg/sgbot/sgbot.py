@@ -9,15 +9,21 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from typing import TYPE_CHECKING
 
+from autosg import metrics
 from autosg.tgbot.handlers import notifications
 
+from . import optimizer
 from . import sg_interface as sg
 from . import steam_rating as sr
+from .deadlines import deadlines
+from .session_pool import sessions
+from .status import statuses
 
 if TYPE_CHECKING:
-    from typing import Dict, List
+    from typing import Container, Dict, List, Optional, Set
 
     from autosg.tgbot.file_storage import JSONStorage
 
@@ -30,8 +36,12 @@ MAX_POINTS_TO_KEEP = 280
 BURN_POINTS = 350
 BURN_SECTION = "All"
 BURN_GAME_SET = 100
+BURN_TOP_K = 50
+SECTION_GAME_SET = 250
 MIN_POINTS = 0
 MAX_POINTS = 400
+# approximate points regeneration on SteamGifts
+POINTS_PER_HOUR = 24
 
 
 class SGUser:
@@ -44,71 +54,171 @@ class SGUser:
         self.tg_id = tg_id
         self.token = token
         self.sections = sections
-        self.sg_session = sg.SteamGiftsSession(tg_id, token)
         self.points = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def sg_session(self) -> sg.SteamGiftsSession:
+        """User's SteamGifts session, opened on demand"""
+        return sessions.get(self.tg_id, self.token, self.lock.locked)
 
     async def get_points(self) -> int:
-        """Return current amount of points for a user"""
-        return await self.sg_session.get_points()
+        """Return current amount of points for a user
+
+        Holds user's lock, so the session pool sees the session as busy
+        and doesn't evict it in the middle of the request.
+        """
+        async with self.lock:
+            try:
+                return await self.sg_session.get_points()
+            finally:
+                await sessions.release(self.tg_id)
+
+    async def _enter_selected(self, giveaways: List[sg.Giveaway]) -> bool:
+        """Enter giveaways picked by optimizer as one batch
+
+        Returns False if the token has expired, the user is notified then.
+        """
+        affordable = []
+        budget = self.points
+        for giveaway in giveaways:
+            if giveaway.cost > budget:
+                logging.info(f"{self.tg_id}: {giveaway.name} is too expensive for now!")
+                continue
+            affordable.append(giveaway)
+            budget -= giveaway.cost
+
+        batch = await self.sg_session.enter_giveaways(affordable)
+        for giveaway in batch.entered:
+            logging.info(f"{self.tg_id}: entered {giveaway.name}")
+            self.points -= giveaway.cost
+            await notifications.notify_on_enter(self.tg_id, giveaway.name)
+        if batch.points is not None:
+            self.points = batch.points
+        if batch.entered:
+            statuses.entered(self.tg_id, self.points, len(batch.entered))
+
+        if batch.stopped == "token_expired":
+            logging.warning(f"{self.tg_id}: sg token has expired, getting update from user")
+            await notifications.notify_expired_token(self.tg_id)
+            return False
+        return True
 
     async def _enter_giveaways_section(
         self, section: str, min_points: int = MIN_POINTS_TO_ENTER
-    ) -> None:
-        """Enter giveaways for a given section"""
+    ) -> bool:
+        """Enter the most valuable set of giveaways for a given section
+
+        Returns False if the token has expired.
+        """
         if self.points < min_points:
             logging.info(f"{self.tg_id}: out of points!")
-            return
+            return True
 
+        candidates = []
         async for giveaway in self.sg_session.get_giveaways_from_section(section):
-            if giveaway.cost > self.points:
-                logging.info(f"{self.tg_id}: {giveaway.name} is too expensive for now!")
-                continue
+            candidates.append(giveaway)
+            if len(candidates) >= SECTION_GAME_SET:
+                break
 
-            if not await self.sg_session.enter_giveaway(giveaway):
-                logging.debug(f"{self.tg_id}: could not enter {giveaway.name}")
-            else:
-                logging.info(f"{self.tg_id}: entered {giveaway.name}")
-                self.points -= giveaway.cost
-                await notifications.notify_on_enter(self.tg_id, giveaway.name)
+        # giveaways ending before the next run get the points first, long
+        # running ones will be seen again with better known odds, so they
+        # only get points which would be lost at the cap by the next run
+        next_run = _next_run_eta()
+        soon = [gw for gw in candidates if 0 < gw.end_time < next_run]
+        later = [gw for gw in candidates if not 0 < gw.end_time < next_run]
+
+        selected = optimizer.select_entries(soon, self.points)
+        left = self.points - sum(giveaway.cost for giveaway in selected)
+        selected += optimizer.select_entries(later, left - _points_to_keep(next_run))
+        logging.info(
+            f"{self.tg_id}: selected {len(selected)} of {len(candidates)} giveaways in {section}"
+        )
+        if not await self._enter_selected(selected):
+            return False
 
-            if self.points < min_points:
-                logging.info(f"{self.tg_id}: out of points!")
-                return
+        selected_codes = {giveaway.code for giveaway in selected}
+        missed = [gw for gw in soon if gw.code not in selected_codes]
+        queued = sum(deadlines.push(self.tg_id, giveaway) for giveaway in missed)
+        if queued:
+            logging.info(f"{self.tg_id}: {queued} giveaways queued to enter before deadline")
+
+        if self.points < min_points:
+            logging.info(f"{self.tg_id}: out of points!")
+        return True
 
     async def _burn_points(self) -> None:
-        """Burn points for a user in case there are too many unused points left"""
-        giveaways = []
-        i = 0
+        """Burn points for a user in case there are too many unused points left
+
+        Candidates are streamed through a bounded heap, so only BURN_TOP_K
+        best of BURN_GAME_SET scanned giveaways are kept with their votes.
+        """
+        prior = sr.RunningPrior()
+        top = optimizer.TopK(BURN_TOP_K)
+        scanned = 0
+        # ranking time leaves out page fetches of the crawl
+        ranking = 0.0
         async for giveaway in self.sg_session.get_giveaways_from_section(BURN_SECTION):
-            giveaways.append(giveaway)
-            i += 1
-            if i > BURN_GAME_SET:
+            started = time.perf_counter()
+            votes = await asyncio.to_thread(sr.get_steamspy_data, giveaway.steam_id)
+            prior.add(votes)
+            top.push(
+                optimizer.entry_value(giveaway, prior.rate(votes)), (giveaway, votes)
+            )
+            ranking += time.perf_counter() - started
+            scanned += 1
+            if scanned > BURN_GAME_SET:
                 break
 
-        giveaways_ranking = sr.get_ranking(
-            [giveaway.steam_id for giveaway in giveaways]
-        )
-        giveaways = sorted(
-            giveaways,
-            key=lambda giveaway: giveaways_ranking[giveaway.steam_id],
-            reverse=True,
+        # admission used prior known at the time, rate survivors with final one
+        started = time.perf_counter()
+        ratings = {giveaway.steam_id: prior.rate(votes) for giveaway, votes in top}
+        metrics.ranking_latency.observe(ranking + time.perf_counter() - started)
+        selected = optimizer.select_entries(
+            (giveaway for giveaway, _ in top), self.points - MAX_POINTS_TO_KEEP, ratings
         )
+        points = self.points
+        await self._enter_selected(selected)
+        metrics.points_burned.inc(points - self.points)
+        logging.info(f"{self.tg_id}: burned enough points.")
+
+    async def enter_before_deadline(self, giveaways: List[sg.Giveaway]) -> None:
+        """Enter queued giveaways which are about to end"""
+        # the lock may be held by a short status refresh, wait for it then
+        if statuses.get(self.tg_id).running:
+            logging.debug(f"{self.tg_id}: user is being polled, skipping deadlines")
+            return
 
-        for giveaway in giveaways:
-            if not await self.sg_session.enter_giveaway(giveaway):
-                logging.debug(f"{self.tg_id}: could not enter {giveaway.name}")
-            else:
-                logging.info(f"{self.tg_id}: entered {giveaway.name}")
-                self.points -= giveaway.cost
-                await notifications.notify_on_enter(self.tg_id, giveaway.name)
+        async with self.lock:
+            try:
+                self.points = await self.sg_session.get_points()
+                statuses.set_points(self.tg_id, self.points)
 
-            if self.points < MAX_POINTS_TO_KEEP:
-                logging.info(f"{self.tg_id}: burned enough points.")
-                return
+                now = time.time()
+                open_giveaways = [gw for gw in giveaways if gw.end_time > now]
+                selected = optimizer.select_entries(open_giveaways, self.points)
+                logging.info(
+                    f"{self.tg_id}: entering {len(selected)} of {len(giveaways)} giveaways before deadline"
+                )
+                await self._enter_selected(selected)
+            finally:
+                await sessions.release(self.tg_id)
 
     async def enter_giveaways(self) -> None:
         """Enter giveaways for a user"""
-        if not await sg.verify_token(self.token):
+        async with self.lock:
+            statuses.start_run(self.tg_id, self.sections)
+            try:
+                with metrics.user_run_latency.time():
+                    await self._enter_giveaways()
+            finally:
+                statuses.finish_run(self.tg_id)
+                metrics.entries_per_cycle.observe(statuses.get(self.tg_id).entered)
+                await sessions.release(self.tg_id)
+
+    async def _enter_giveaways(self) -> None:
+        """Check user's token and points and go through selected sections"""
+        if not await sg.verify_token(self.token, self.sg_session.session):
             logging.warning(
                 f"{self.tg_id}: sg token is invalid, getting update from user"
             )
@@ -120,13 +230,16 @@ class SGUser:
         except Exception:
             logging.exception(f"{self.tg_id}: failed to update session, skipping cycle")
             return
+        statuses.set_points(self.tg_id, self.points)
 
         for section in self.sections:
             logging.info(f"{self.tg_id}: polling section {section}")
+            statuses.start_section(self.tg_id, section)
 
             if self.points > MIN_POINTS_TO_ENTER:
                 logging.info(f"{self.tg_id}: starting with {self.points} points")
-                await self._enter_giveaways_section(section)
+                if not await self._enter_giveaways_section(section):
+                    return
             else:
                 logging.info(f"{self.tg_id}: out of points!")
                 return
@@ -136,9 +249,29 @@ class SGUser:
             await self._burn_points()
 
 
+def _next_run_eta() -> float:
+    """Estimate when a user polled now will be polled again"""
+    return time.time() + SG_CYCLE + len(SGUser.users) * SG_USERS_DELAY
+
+
+def _points_to_keep(next_run: float) -> int:
+    """Most points to keep without reaching the cap before the next run"""
+    regenerated = POINTS_PER_HOUR * (next_run - time.time()) / 3600
+    return max(0, int(MAX_POINTS - regenerated))
+
+
 async def user_status(idx: int) -> str:
-    """Returns status string for a given user"""
-    return f"You have {await SGUser.users[str(idx)].get_points()} points unused."
+    """Returns status string for a given user from memory
+
+    Points are refreshed in background if they are stale.
+    """
+    tg_id = str(idx)
+    status = statuses.get(tg_id)
+    user = SGUser.users.get(tg_id)
+    if user and status.is_stale():
+        statuses.refresh(tg_id, user.get_points)
+
+    return status.describe()
 
 
 def _parse_user(user: Dict) -> Dict:
@@ -172,8 +305,10 @@ async def _cleanup_users(storage_users: Dict, users: Dict) -> Dict:
         if user in storage_users:
             new_users[user] = users[user]
         else:
-            await users[user].sg_session.session.close()
-            logging.info(f"{user}: user opted out in Telegram bot, removing from poll")
+            await sessions.discard(user)
+            statuses.discard(user)
+            deadlines.discard([user])
+            logging.info(f"{user}: user is not in storage anymore, removing from poll")
 
     return new_users
 
@@ -183,53 +318,103 @@ def _update_users(storage_users: Dict, users: Dict) -> Dict:
     if len(users):
         for user in storage_users:
             if user in users:
+                if users[user].token != storage_users[user]["token"]:
+                    sessions.set_token(user, storage_users[user]["token"])
                 users[user].token = storage_users[user]["token"]
                 users[user].sections = storage_users[user]["sections"]
 
     return users
 
 
-async def _add_users(storage_users: Dict, users: Dict) -> Dict:
-    """Add new users from Telegram bot"""
+async def _add_users(
+    storage_users: Dict, users: Dict, announce: Optional[Container[str]] = None
+) -> Dict:
+    """Add new users from Telegram bot, notifying announced ones"""
     if len(users) != len(storage_users):
         for user_id, user in storage_users.items():
+            if user_id in users:
+                continue
             users[user_id] = SGUser(user["tg_id"], user["token"], user["sections"])
             logging.warning(f"{user_id}: added user to poll")
-            await notifications.notify_on_start(user_id)
+            if announce is None or user_id in announce:
+                await notifications.notify_on_start(user_id)
 
     return users
 
 
-async def _sync_users(storage: JSONStorage, users: Dict) -> Dict:
+async def _sync_users(
+    storage: JSONStorage, users: Dict, announce: Optional[Container[str]] = None
+) -> Dict:
     """Actualize list of users to enter giveaways for from Telegram storage"""
     storage_users = await _get_users_from_storage(storage)
 
     users = await _cleanup_users(storage_users, users)
     users = _update_users(storage_users, users)
-    users = await _add_users(storage_users, users)
+    users = await _add_users(storage_users, users, announce)
 
     return users
 
 
-async def start_gw_entering(storage: JSONStorage) -> None:
-    """Cycle through registered users and enter giveaways for them"""
+async def sync_users(storage: JSONStorage, announce: Optional[Container[str]] = None) -> None:
+    """Apply users from storage right away, before the next user's run
+
+    New users are notified that the bot works for them, only those in
+    announce if it is given.
+    """
+    SGUser.users = await _sync_users(storage, SGUser.users, announce)
+
+
+def _next_user(polled: Set[str]) -> Optional[SGUser]:
+    """A current user not polled in this cycle yet"""
+    return next((user for tg_id, user in SGUser.users.items() if tg_id not in polled), None)
+
+
+async def start_gw_entering(storage: Optional[JSONStorage] = None) -> None:
+    """Cycle through registered users and enter giveaways for them
+
+    Users are synced from storage at the start of every cycle. Without
+    storage the caller applies them with sync_users, and users added or
+    removed meanwhile are picked up or skipped within the current cycle.
+    """
     try:
         while True:
-            SGUser.users = await _sync_users(storage, SGUser.users)
+            if storage is not None:
+                await sync_users(storage)
 
-            for user in SGUser.users.values():
+            polled: Set[str] = set()
+            while user := _next_user(polled):
+                polled.add(user.tg_id)
                 logging.info(
                     f"{user.tg_id}: polling user with sections: {user.sections}"
                 )
                 try:
-                    await user.enter_giveaways()
+                    # named task lets profiler attribute samples to the user
+                    await asyncio.create_task(
+                        user.enter_giveaways(), name=f"user-{user.tg_id}"
+                    )
                 except Exception:
+                    metrics.user_errors.inc()
                     logging.exception(f"{user.tg_id}: unhandled error, skipping user this cycle")
                 await asyncio.sleep(SG_USERS_DELAY)
 
             await asyncio.sleep(SG_CYCLE)
     finally:
         logging.info("Closing user sessions…")
-        for user in SGUser.users.values():
-            await user.sg_session.session.close()
+        await sessions.close_all()
         logging.info("User sessions closed")
+
+
+async def start_deadline_entering() -> None:
+    """Wake users shortly before deadlines of giveaways they could not enter"""
+    while True:
+        await deadlines.wait()
+
+        for tg_id, giveaways in deadlines.pop_due(time.time()).items():
+            user = SGUser.users.get(tg_id)
+            if not user:
+                continue
+
+            try:
+                await user.enter_before_deadline(giveaways)
+            except Exception:
+                logging.exception(f"{tg_id}: failed to enter giveaways before deadline")
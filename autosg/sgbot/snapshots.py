@@ -0,0 +1,64 @@
+"""Bounded on-disk store of raw pages SteamGifts interface failed to parse.
+
+Pages are kept gzipped under an ID referenced from logs, the oldest
+snapshots are removed once the limit is reached.
+"""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import pathlib
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import List, Union
+
+
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_LIMIT = 50
+SNAPSHOT_SUFFIX = ".html.gz"
+
+
+class SnapshotStore:
+    """Ring buffer of compressed page snapshots"""
+
+    def __init__(
+        self, path: Union[pathlib.Path, str], limit: int = SNAPSHOT_LIMIT
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.limit = limit
+        self._counter = 0
+
+    def _snapshots(self) -> List[pathlib.Path]:
+        """Stored snapshots, oldest first"""
+        return sorted(self.path.glob(f"*{SNAPSHOT_SUFFIX}"))
+
+    def save(self, html: str, url: str = "") -> str:
+        """Store a page and return its snapshot ID"""
+        self._counter += 1
+        snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._counter:04d}"
+
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            stored = self._snapshots()
+            for old in stored[: max(0, len(stored) - self.limit + 1)]:
+                old.unlink(missing_ok=True)
+
+            with gzip.open(self.path / f"{snapshot_id}{SNAPSHOT_SUFFIX}", "wt") as file:
+                file.write(f"<!-- {url} -->\n")
+                file.write(html)
+        except OSError:
+            logging.exception(f"Failed to store snapshot {snapshot_id}")
+
+        return snapshot_id
+
+    def load(self, snapshot_id: str) -> str:
+        """Read a stored page back"""
+        with gzip.open(self.path / f"{snapshot_id}{SNAPSHOT_SUFFIX}", "rt") as file:
+            return file.read()
+
+
+snapshots = SnapshotStore(SNAPSHOT_DIR)
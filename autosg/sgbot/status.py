@@ -0,0 +1,148 @@
+"""Keeps last known state of users' runs to answer status requests from memory.
+
+Status is updated by the entering loop as it goes, so replies never wait for
+SteamGifts. A background refresh is only scheduled when data gets stale.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+
+STATUS_TTL = 3600
+
+
+# flat record, exported as is to share statuses between processes
+@dataclass
+class UserStatus:  # pylint: disable=too-many-instance-attributes
+    """Last known state of a user"""
+
+    points: Optional[int] = None
+    updated: float = 0
+    running: bool = False
+    section: str = ""
+    sections: List[str] = field(default_factory=list)
+    sections_done: int = 0
+    entered: int = 0
+    last_run: float = 0
+
+    def is_stale(self) -> bool:
+        """Check if points value is too old to be trusted"""
+        return time.time() - self.updated > STATUS_TTL
+
+    def describe(self) -> str:
+        """Human readable status for a user"""
+        if self.points is None:
+            return "Your status is not known yet, please, check back later."
+
+        lines = [
+            f"You have {self.points} points unused "
+            f"(as of {time.strftime('%H:%M', time.localtime(self.updated))})."
+        ]
+        if self.running and self.section:
+            lines.append(
+                f"Polling {self.section} section "
+                f"({self.sections_done + 1}/{len(self.sections)}), "
+                f"entered {self.entered} giveaways so far."
+            )
+        elif self.running:
+            lines.append("Your run has just started.")
+        elif self.last_run:
+            lines.append(
+                f"Last run finished at "
+                f"{time.strftime('%H:%M', time.localtime(self.last_run))}, "
+                f"entered {self.entered} giveaways."
+            )
+        return "\n".join(lines)
+
+
+class StatusService:
+    """In-memory registry of users' statuses"""
+
+    def __init__(self) -> None:
+        self._statuses: Dict[str, UserStatus] = {}
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get(self, tg_id: str) -> UserStatus:
+        """Return status for a user, creating an empty one if needed"""
+        return self._statuses.setdefault(tg_id, UserStatus())
+
+    def discard(self, tg_id: str) -> None:
+        """Forget status of a removed user"""
+        self._statuses.pop(tg_id, None)
+
+    def export(self) -> Dict[str, Dict]:
+        """Statuses as plain data to pass to another process"""
+        return {tg_id: asdict(status) for tg_id, status in self._statuses.items()}
+
+    def merge(self, exported: Dict[str, Dict]) -> None:
+        """Take over statuses exported by another process"""
+        for tg_id, status in exported.items():
+            self._statuses[tg_id] = UserStatus(**status)
+
+    def set_points(self, tg_id: str, points: int) -> None:
+        """Record fresh points value"""
+        status = self.get(tg_id)
+        status.points = points
+        status.updated = time.time()
+
+    def start_run(self, tg_id: str, sections: List[str]) -> None:
+        """Mark start of a user's run"""
+        status = self.get(tg_id)
+        status.running = True
+        status.sections = list(sections)
+        status.sections_done = 0
+        status.section = ""
+        status.entered = 0
+
+    def start_section(self, tg_id: str, section: str) -> None:
+        """Mark start of polling of a section"""
+        status = self.get(tg_id)
+        if status.section:
+            status.sections_done += 1
+        status.section = section
+
+    def entered(self, tg_id: str, points: int, count: int = 1) -> None:
+        """Record entered giveaways and points left"""
+        self.get(tg_id).entered += count
+        self.set_points(tg_id, points)
+
+    def finish_run(self, tg_id: str) -> None:
+        """Mark end of a user's run"""
+        status = self.get(tg_id)
+        status.running = False
+        status.section = ""
+        status.last_run = time.time()
+
+    def refresh(self, tg_id: str, get_points: Callable[[], Awaitable[int]]) -> None:
+        """Schedule background refresh of points unless one is in progress"""
+        if tg_id in self._refreshing or self.get(tg_id).running:
+            return
+
+        self._refreshing.add(tg_id)
+        task = asyncio.create_task(self._refresh(tg_id, get_points))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(
+        self, tg_id: str, get_points: Callable[[], Awaitable[int]]
+    ) -> None:
+        """Fetch points for a user and store them"""
+        try:
+            self.set_points(tg_id, await get_points())
+            logging.debug(f"{tg_id}: status refreshed")
+        except Exception:
+            logging.warning(f"{tg_id}: failed to refresh status")
+        finally:
+            self._refreshing.discard(tg_id)
+
+
+statuses = StatusService()
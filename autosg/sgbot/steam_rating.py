@@ -8,7 +8,6 @@ https://github.com/woctezuma/Steam-Bayesian-Average
 from __future__ import annotations
 
 import logging
-from time import sleep
 from json.decoder import JSONDecodeError
 from typing import TYPE_CHECKING
 
@@ -16,7 +15,9 @@ from tenacity import retry
 from tenacity.stop import stop_after_attempt
 from tenacity.wait import wait_fixed, wait_random
 
-import steamspypi
+from autosg import metrics
+
+from . import transport
 
 if TYPE_CHECKING:
     from typing import Dict
@@ -67,6 +68,38 @@ def compute_prior(games: Dict) -> Dict:
     return prior
 
 
+class RunningPrior:
+    """Prior for a set of games accumulated one game at a time
+
+    Gives the same prior as compute_prior without keeping games around.
+    """
+
+    def __init__(self) -> None:
+        self.increment = 0
+        self.num_votes = 0
+        self.games = 0
+
+    def add(self, game: Dict) -> None:
+        """Account votes of a game"""
+        self.increment += compute_game_increment_value(game)
+        self.num_votes += compute_game_num_votes(game)
+        self.games += 1
+
+    def prior(self) -> Dict:
+        """Current prior of accounted games"""
+        return {
+            "raw_score": self.increment / self.num_votes if self.num_votes else 0,
+            "num_votes": self.num_votes / self.games if self.games else 0,
+        }
+
+    def rate(self, game: Dict) -> float:
+        """Bayesian average of a game against current prior"""
+        try:
+            return compute_bayesian_average_for_a_game(game, self.prior())
+        except ZeroDivisionError:
+            return 0
+
+
 def compute_bayesian_average_for_games(games: Dict) -> Dict:
     """Compute bayesian average rating for a set of games"""
     prior = compute_prior(games)
@@ -79,7 +112,11 @@ def compute_bayesian_average_for_games(games: Dict) -> Dict:
     return games
 
 
-@retry(stop=stop_after_attempt(5), wait=wait_fixed(10) + wait_random(10, 30))
+@retry(
+    stop=stop_after_attempt(5),
+    wait=wait_fixed(10) + wait_random(10, 30),
+    before_sleep=metrics.count_retry,
+)
 def get_steamspy_data(game_id: str) -> Dict:
     """Get votes info from SteamSpy for a game"""
     empty_data = {"positive": 0, "negative": 0}
@@ -92,8 +129,8 @@ def get_steamspy_data(game_id: str) -> Dict:
     data_request["appid"] = game_id
 
     try:
-        sleep(0.5)
-        data = steamspypi.download(data_request)
+        with metrics.steamspy_latency.time():
+            data = transport.steamspy_download(data_request)
     except JSONDecodeError:
         logging.warning(f"Failed to fetch SteamSpy data for {game_id}")
         data = empty_data
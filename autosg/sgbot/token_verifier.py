@@ -0,0 +1,75 @@
+"""Background verification of user-provided SteamGifts tokens.
+
+Tokens are put into a queue and verified by a few workers, each reusing its
+own session. Repeated submissions of a token being verified share one job.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from . import transport
+from .sg_interface import verify_token
+
+if TYPE_CHECKING:
+    from typing import Dict
+
+
+VERIFY_WORKERS = 2
+
+
+class TokenVerifier:
+    """Queue of tokens to verify served by pooled sessions"""
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._jobs: Dict[str, asyncio.Future[bool]] = {}
+
+    def submit(self, token: str) -> asyncio.Future[bool]:
+        """Queue a token for verification, return future with a result"""
+        if token in self._jobs:
+            logging.debug("Token is already being verified, reusing job")
+            return self._jobs[token]
+
+        job = asyncio.get_running_loop().create_future()
+        self._jobs[token] = job
+        self._queue.put_nowait(token)
+        return job
+
+    async def _worker(self) -> None:
+        """Verify queued tokens one by one using a single session"""
+        async with transport.new_session() as session:
+            while True:
+                token = await self._queue.get()
+                job = self._jobs[token]
+                session.cookies.clear()
+                session.cookies.set("PHPSESSID", token)
+                try:
+                    job.set_result(await verify_token(token, session))
+                except Exception as exc:
+                    logging.warning("Failed to verify token")
+                    job.set_exception(exc)
+                finally:
+                    del self._jobs[token]
+                    self._queue.task_done()
+
+    async def run(self, workers: int = VERIFY_WORKERS) -> None:
+        """Serve verification queue until cancelled"""
+        async with asyncio.TaskGroup() as tgroup:
+            for _ in range(workers):
+                tgroup.create_task(self._worker())
+
+
+token_verifier = TokenVerifier()
+
+
+def submit_token(token: str) -> asyncio.Future[bool]:
+    """Queue a token for background verification"""
+    return token_verifier.submit(token)
+
+
+async def start_token_verification() -> None:
+    """Run token verification workers"""
+    await token_verifier.run()
@@ -0,0 +1,257 @@
+"""HTTP transport for SteamGifts sessions and SteamSpy fetcher.
+
+Normally it is a plain curl_cffi session. For performance regression runs
+responses can be recorded once to a compressed fixture archive and then
+replayed offline, either with original timing or at full speed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import gzip
+import json
+import pathlib
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from json.decoder import JSONDecodeError
+from typing import TYPE_CHECKING
+
+from curl_cffi.requests import AsyncSession
+
+if TYPE_CHECKING:
+    from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+
+IMPERSONATE = "chrome124"
+STEAMSPY_DELAY = 0.5
+
+
+class FixtureMissing(LookupError):
+    """Replayed request was never recorded"""
+
+
+@dataclass
+class ReplayResponse:
+    """Recorded response with attributes sessions' users rely on"""
+
+    text: str
+    status_code: int = 200
+    history: List[Dict] = field(default_factory=list)
+    elapsed: float = 0
+
+
+class FixtureArchive:
+    """Gzipped JSON lines file of recorded responses"""
+
+    def __init__(self, path: Union[pathlib.Path, str]) -> None:
+        self.path = pathlib.Path(path)
+        self._file = None
+        self._lock = threading.Lock()
+        self._responses: Dict[Tuple, Deque[Dict]] = defaultdict(deque)
+
+    @staticmethod
+    def key(kind: str, method: str, url: str, data: Any = None) -> Tuple:
+        """Request identity used to match replayed requests"""
+        return (kind, method, url, json.dumps(data, sort_keys=True))
+
+    def append(self, record: Dict) -> None:
+        """Add a record to the archive"""
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, "at")
+            self._file.write(line)
+            self._file.flush()
+
+    def load(self) -> None:
+        """Read all records grouped by request"""
+        with gzip.open(self.path, "rt") as file:
+            for line in file:
+                record = json.loads(line)
+                self._responses[
+                    self.key(record["kind"], record["method"], record["url"], record["data"])
+                ].append(record)
+
+    def take(self, key: Tuple) -> Dict:
+        """Next recorded response for a request, the last one is repeated"""
+        responses = self._responses.get(key)
+        if not responses:
+            raise FixtureMissing(f"no recorded response for {key}")
+        return responses.popleft() if len(responses) > 1 else responses[0]
+
+    def close(self) -> None:
+        """Finish writing the archive"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RecordingSession:
+    """curl_cffi session saving every response to an archive"""
+
+    def __init__(self, archive: FixtureArchive) -> None:
+        self._archive = archive
+        self._session = AsyncSession(impersonate=IMPERSONATE)
+        self.cookies = self._session.cookies
+
+    async def _request(self, method: str, url: str, data: Optional[Dict] = None) -> Any:
+        """Make a real request and record its response"""
+        start = time.perf_counter()
+        if method == "GET":
+            response = await self._session.get(url)
+        else:
+            response = await self._session.post(url, data=data)
+        self._archive.append(
+            {
+                "kind": "http",
+                "method": method,
+                "url": url,
+                "data": _strip_xsrf(data),
+                "status": response.status_code,
+                "text": response.text,
+                "redirects": len(response.history),
+                "elapsed": time.perf_counter() - start,
+            }
+        )
+        return response
+
+    async def get(self, url: str) -> Any:
+        """GET a page"""
+        return await self._request("GET", url)
+
+    async def post(self, url: str, data: Optional[Dict] = None) -> Any:
+        """POST a form"""
+        return await self._request("POST", url, data)
+
+    async def close(self) -> None:
+        """Close underlying session"""
+        await self._session.close()
+
+    async def __aenter__(self) -> RecordingSession:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+
+class _ReplayCookies(dict):
+    """Cookie jar stand-in, replayed requests ignore cookies"""
+
+    def set(self, name: str, value: str) -> None:
+        """Set a cookie"""
+        self[name] = value
+
+
+class ReplaySession:
+    """Offline session answering requests from an archive"""
+
+    def __init__(self, archive: FixtureArchive, realtime: bool = False) -> None:
+        self._archive = archive
+        self._realtime = realtime
+        self.cookies = _ReplayCookies()
+        self.requests: Counter[str] = Counter()
+
+    async def _request(self, method: str, url: str, data: Optional[Dict] = None) -> ReplayResponse:
+        """Serve a recorded response"""
+        record = self._archive.take(
+            FixtureArchive.key("http", method, url, _strip_xsrf(data))
+        )
+        self.requests[url] += 1
+        if self._realtime:
+            await asyncio.sleep(record["elapsed"])
+        return ReplayResponse(
+            text=record["text"],
+            status_code=record["status"],
+            history=[{}] * record["redirects"],
+            elapsed=record["elapsed"],
+        )
+
+    async def get(self, url: str) -> ReplayResponse:
+        """GET a page"""
+        return await self._request("GET", url)
+
+    async def post(self, url: str, data: Optional[Dict] = None) -> ReplayResponse:
+        """POST a form"""
+        return await self._request("POST", url, data)
+
+    async def close(self) -> None:
+        """Nothing to close"""
+
+    async def __aenter__(self) -> ReplaySession:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+
+def _strip_xsrf(data: Optional[Dict]) -> Optional[Dict]:
+    """Drop per-session xsrf_token so requests match across runs"""
+    if data is None:
+        return None
+    return {key: value for key, value in data.items() if key != "xsrf_token"}
+
+
+@dataclass
+class _FixturesMode:
+    """Fixtures the transport currently records to or replays from"""
+
+    mode: str = ""
+    archive: Optional[FixtureArchive] = None
+    realtime: bool = False
+
+
+_fixtures = _FixturesMode()
+
+
+def use_fixtures(mode: str, path: Union[pathlib.Path, str], realtime: bool = False) -> None:
+    """Switch transport to 'record' or 'replay' mode with a given archive"""
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unknown fixtures mode: {mode}")
+
+    archive = FixtureArchive(path)
+    _fixtures.mode, _fixtures.archive, _fixtures.realtime = mode, archive, realtime
+    if mode == "replay":
+        archive.load()
+    else:
+        atexit.register(archive.close)
+
+
+def new_session() -> Any:
+    """Create HTTP session according to the transport mode"""
+    if _fixtures.mode == "record":
+        return RecordingSession(_fixtures.archive)
+    if _fixtures.mode == "replay":
+        return ReplaySession(_fixtures.archive, _fixtures.realtime)
+    return AsyncSession(impersonate=IMPERSONATE)
+
+
+def steamspy_download(data_request: Dict) -> Dict:
+    """Fetch SteamSpy data, recording or replaying it if requested"""
+    if _fixtures.mode == "replay":
+        record = _fixtures.archive.take(FixtureArchive.key("steamspy", "GET", "", data_request))
+        if _fixtures.realtime:
+            time.sleep(record["elapsed"])
+        if "error" in record:
+            raise JSONDecodeError(record["error"], "", 0)
+        return record["response"]
+
+    import steamspypi  # pylint: disable=import-outside-toplevel
+
+    time.sleep(STEAMSPY_DELAY)
+    if _fixtures.mode != "record":
+        return steamspypi.download(data_request)
+
+    record = {"kind": "steamspy", "method": "GET", "url": "", "data": data_request}
+    start = time.perf_counter()
+    try:
+        record["response"] = steamspypi.download(data_request)
+    except JSONDecodeError as exc:
+        record["error"] = exc.msg
+        raise
+    finally:
+        record["elapsed"] = time.perf_counter() - start
+        _fixtures.archive.append(record)
+    return record["response"]
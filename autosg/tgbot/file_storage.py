@@ -60,6 +60,13 @@ class JSONStorage(_FileStorage):
 
         return copy.deepcopy(self.storage[chat][user]["data"])
 
+    async def get_value(self, storage_key, dict_key, default=None):
+        chat = str(storage_key.chat_id)
+        user = str(storage_key.user_id)
+
+        # shallow copy is enough to protect stored lists from callers
+        return copy.copy(self.storage[chat][user]["data"].get(dict_key, default))
+
     async def update_data(self, key, data):
         chat = str(key.chat_id)
         user = str(key.user_id)
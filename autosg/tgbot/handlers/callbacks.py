@@ -8,7 +8,7 @@ from typing import TYPE_CHECKING
 from aiogram import Router
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message
-from .markups import sections_kb
+from .markups import SECTION_CALLBACKS, sections_kb
 
 if TYPE_CHECKING:
     from aiogram.fsm.context import FSMContext
@@ -17,7 +17,7 @@ if TYPE_CHECKING:
 callback_router = Router()
 
 
-@callback_router.callback_query(lambda c: c.data[:3] in ["del", "add"])
+@callback_router.callback_query(lambda c: c.data in SECTION_CALLBACKS)
 async def update_sections_info(
     callback_query: CallbackQuery, state: FSMContext
 ) -> None:
@@ -30,18 +30,18 @@ async def update_sections_info(
         logging.error("Callback query message is not of a Message type! Ignoring.")
         return
 
-    section = callback_query.data.split("_")[-1]
-    sections = (await state.get_data())["sections"]
+    action, section = SECTION_CALLBACKS[callback_query.data]
+    sections = await state.get_value("sections", [])
 
-    if callback_query.data.startswith("add"):
+    if action == "add" and section not in sections:
         sections.append(section)
-    elif len(sections) > 1:
+    elif action == "del" and section in sections and len(sections) > 1:
         sections.remove(section)
     await state.update_data(sections=sections)
 
     with suppress(TelegramBadRequest):
         await callback_query.message.edit_reply_markup(
-            reply_markup=await sections_kb(state)
+            reply_markup=sections_kb(sections)
         )
 
     await callback_query.answer()
@@ -2,38 +2,66 @@
 
 from __future__ import annotations
 
+from functools import cache
 from typing import TYPE_CHECKING
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from autosg import sgbot
-from emoji import emojize
 
 if TYPE_CHECKING:
-    from aiogram.fsm.context import FSMContext
-
-
-async def sections_kb(state: FSMContext) -> InlineKeyboardMarkup:
-    """Create KB with sections and current selection state"""
-    buttons = []
-    selected_sections = (await state.get_data())["sections"]
-
-    for section in list(sgbot.SECTION_URLS):
-        if section in selected_sections:
-            buttons.append(
-                [
-                    InlineKeyboardButton(
-                        text=f"{emojize(':check_mark_button:')} {section}",
-                        callback_data=f"del_section_{section}",
-                    )
-                ]
-            )
-        else:
-            buttons.append(
-                [
-                    InlineKeyboardButton(
-                        text=section, callback_data=f"add_section_{section}"
-                    )
-                ]
-            )
-
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    from typing import Iterable, Tuple
+
+
+SECTIONS = list(sgbot.SECTION_URLS)
+SECTION_BITS = {section: 1 << idx for idx, section in enumerate(SECTIONS)}
+# routing table of sections keyboard callbacks: data -> (action, section)
+SECTION_CALLBACKS = {
+    f"{action}_section_{section}": (action, section)
+    for section in SECTIONS
+    for action in ("add", "del")
+}
+
+
+def sections_mask(sections: Iterable[str]) -> int:
+    """Bitmask of selected sections"""
+    mask = 0
+    for section in sections:
+        mask |= SECTION_BITS.get(section, 0)
+    return mask
+
+
+@cache
+def _sections_kbs() -> Tuple[InlineKeyboardMarkup, ...]:
+    """Build keyboards for every combination of selected sections once"""
+    from emoji import emojize  # pylint: disable=import-outside-toplevel
+
+    check_mark = emojize(":check_mark_button:")
+    keyboards = []
+    for mask in range(1 << len(SECTIONS)):
+        buttons = []
+        for section in SECTIONS:
+            if mask & SECTION_BITS[section]:
+                buttons.append(
+                    [
+                        InlineKeyboardButton(
+                            text=f"{check_mark} {section}",
+                            callback_data=f"del_section_{section}",
+                        )
+                    ]
+                )
+            else:
+                buttons.append(
+                    [
+                        InlineKeyboardButton(
+                            text=section, callback_data=f"add_section_{section}"
+                        )
+                    ]
+                )
+        keyboards.append(InlineKeyboardMarkup(inline_keyboard=buttons))
+
+    return tuple(keyboards)
+
+
+def sections_kb(sections: Iterable[str]) -> InlineKeyboardMarkup:
+    """KB with sections and current selection state"""
+    return _sections_kbs()[sections_mask(sections)]
@@ -2,22 +2,28 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from typing import TYPE_CHECKING
 
 from aiogram import Router
-from aiogram.filters import Command, CommandStart
+from aiogram.filters import Command, CommandObject, CommandStart
 
-from autosg import sgbot
+from autosg import config, metrics, profiling, sgbot
 
 from .markups import sections_kb
 
 if TYPE_CHECKING:
+    from typing import Set
+
     from aiogram.fsm.context import FSMContext
     from aiogram.types import Message
 
 
+MESSAGE_LIMIT = 3500
+
 message_router = Router()
+_verifications: Set[asyncio.Task] = set()
 
 
 # def register_commands(dispatcher: Dispatcher):
@@ -95,7 +101,7 @@ async def handle_configure(message: Message, state: FSMContext) -> None:
     if "token" in await state.get_data():
         await message.answer(
             "Please, select, which types of giveaways you're interested in.",
-            reply_markup=await sections_kb(state),
+            reply_markup=sections_kb(await state.get_value("sections", [])),
         )
     else:
         await message.answer("You should /register first.")
@@ -122,6 +128,37 @@ async def handle_unregister(message: Message, state: FSMContext) -> None:
         await message.answer("You should /register first.")
 
 
+@message_router.message(Command(commands="metrics"))
+async def handle_metrics(message: Message) -> None:
+    """Handle /metrics command from bot admin"""
+    if not message.from_user or str(message.from_user.id) != config.ADMIN_ID:
+        await message.answer("Unknown command.\nPlease, try again.")
+        return
+
+    logging.debug(f"{message.from_user.id}: received /metrics command")
+    await message.answer(metrics.summary())
+
+
+@message_router.message(Command(commands="profile"))
+async def handle_profile(message: Message, command: CommandObject) -> None:
+    """Handle /profile [seconds] command from bot admin"""
+    if not message.from_user or str(message.from_user.id) != config.ADMIN_ID:
+        await message.answer("Unknown command.\nPlease, try again.")
+        return
+
+    logging.debug(f"{message.from_user.id}: received /profile command")
+    seconds = int(command.args) if command.args and command.args.isdigit() else profiling.PROFILE_WINDOW
+    task = profiling.start_profile(seconds)
+    if not task:
+        await message.answer("Profiling is already running.")
+        return
+
+    await message.answer(f"Profiling for {min(seconds, profiling.MAX_PROFILE_WINDOW)}s…")
+    report, path = await task
+    # Telegram limits message length, full report stays in the file
+    await message.answer(f"{path}\n\n{report[:MESSAGE_LIMIT]}")
+
+
 @message_router.message()
 async def handle_token(message: Message, state: FSMContext) -> None:
     """Handle any text message from a user as a SteamGifts token"""
@@ -132,16 +169,45 @@ async def handle_token(message: Message, state: FSMContext) -> None:
 
     logging.debug(f"State: {await state.get_data()}")
     if "token" in await state.get_data() and message.text and message.from_user:
-        if await sgbot.verify_token(message.text):
-            await state.update_data(
-                token=message.text, sections=list(sgbot.SECTION_URLS)[0:1]
-            )
-            await message.answer("Your PHPSESSID was successfully updated.")
-            logging.warning(f"{message.from_user.id}: token successfully updated.")
-        else:
-            await message.answer(
-                "Provided PHPSESSID is invalid.\n"
-                "Please, verify it and provide it again below."
+        reply = await message.answer("Verifying PHPSESSID…")
+        task = asyncio.create_task(
+            _finish_token_update(
+                message.from_user.id,
+                message.text,
+                reply,
+                state,
+                sgbot.submit_token(message.text),
             )
+        )
+        _verifications.add(task)
+        task.add_done_callback(_verifications.discard)
     else:
         await message.answer("Unknown command.\nPlease, try again.")
+
+
+async def _finish_token_update(
+    user_id: int,
+    token: str,
+    reply: Message,
+    state: FSMContext,
+    verification: asyncio.Future[bool],
+) -> None:
+    """Store verified token and report verification result to a user"""
+    try:
+        verified = await asyncio.shield(verification)
+    except Exception:
+        await reply.edit_text(
+            "Could not verify PHPSESSID right now.\n"
+            "Please, try to provide it again later."
+        )
+        return
+
+    if verified:
+        await state.update_data(token=token, sections=list(sgbot.SECTION_URLS)[0:1])
+        await reply.edit_text("Your PHPSESSID was successfully updated.")
+        logging.warning(f"{user_id}: token successfully updated.")
+    else:
+        await reply.edit_text(
+            "Provided PHPSESSID is invalid.\n"
+            "Please, verify it and provide it again below."
+        )
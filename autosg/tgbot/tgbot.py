@@ -26,6 +26,7 @@ def init_tg() -> Tuple[JSONStorage, Dispatcher]:
         raise EnvironmentError("TELEGRAM_TOKEN is not defined!")
 
     config.bot = Bot(token=token)
+    config.ADMIN_ID = os.getenv("ADMIN_ID", default="")
     storage = JSONStorage("users.json")
     dispatcher = Dispatcher(storage=storage)
 
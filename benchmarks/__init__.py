@@ -0,0 +1,3 @@
+"""
+Performance benchmarks for autosg, run against local stand-ins of external services.
+"""
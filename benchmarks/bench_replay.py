@@ -0,0 +1,122 @@
+"""Performance regression suite replaying recorded SteamGifts and SteamSpy responses.
+
+Record fixtures once with a real PHPSESSID (sections are only crawled and
+ranked, nothing is entered):
+
+    python -m benchmarks.bench_replay record fixtures.jsonl.gz --token PHPSESSID
+
+Replay them offline at full speed and compare with a previous run:
+
+    python -m benchmarks.bench_replay replay fixtures.jsonl.gz \
+        --output results.json --baseline baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import TYPE_CHECKING
+
+from autosg.sgbot import rate_limit
+from autosg.sgbot import sg_interface as sg
+from autosg.sgbot import steam_rating as sr
+from autosg.sgbot import transport
+
+if TYPE_CHECKING:
+    from typing import Dict, List
+
+
+# metrics where a bigger value is a regression
+LOWER_IS_BETTER = ("_requests", "_seconds")
+
+
+async def crawl(token: str, sections: List[str], burn_set: int) -> Dict:
+    """Crawl sections and rank burn candidates, measuring each stage"""
+    results = {}
+    session = sg.SteamGiftsSession("bench", token)
+    try:
+        for section in sections:
+            requests = sum(getattr(session.session, "requests", {}).values())
+            start = time.perf_counter()
+            giveaways = [giveaway async for giveaway in session.get_giveaways_from_section(section)]
+            elapsed = time.perf_counter() - start
+            if isinstance(session.session, transport.ReplaySession):
+                results[f"{section}_requests"] = (
+                    sum(session.session.requests.values()) - requests
+                )
+            results[f"{section}_giveaways"] = len(giveaways)
+            results[f"{section}_seconds"] = elapsed
+            results[f"{section}_giveaways_per_second"] = len(giveaways) / elapsed if elapsed else 0
+
+        giveaways = []
+        async for giveaway in session.get_giveaways_from_section("All"):
+            giveaways.append(giveaway)
+            if len(giveaways) >= burn_set:
+                break
+        start = time.perf_counter()
+        sr.get_ranking([giveaway.steam_id for giveaway in giveaways])
+        results["ranking_seconds"] = time.perf_counter() - start
+    finally:
+        await session.session.close()
+
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """List metrics regressed beyond tolerance against baseline"""
+    regressions = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        if not name.endswith(LOWER_IS_BETTER):
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{name}: {old:.4g} -> {value:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main(args: argparse.Namespace) -> int:
+    """Record or replay fixtures and report results"""
+    transport.use_fixtures(args.mode, args.fixtures, realtime=args.realtime)
+    if args.mode == "replay" and not args.realtime:
+        sg.SG_THROTTLE = 0
+        sg.SG_JITTER = 0
+        rate_limit.set_limiter(rate_limit.RateLimiter(0))
+
+    results = asyncio.run(crawl(args.token, args.sections, args.burn_set))
+    for name, value in results.items():
+        print(f"{name:>40}: {value:.4g}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("fixtures", help="path to gzipped fixture archive")
+    parser.add_argument("--token", default="", help="PHPSESSID for recording")
+    parser.add_argument("--sections", nargs="+", default=["Wishlist", "Recommended", "New"])
+    parser.add_argument("--burn-set", type=int, default=100, help="games to rank")
+    parser.add_argument("--realtime", action="store_true", help="replay with original timing")
+    parser.add_argument("--output", help="write results to a JSON file")
+    parser.add_argument("--baseline", help="compare with results JSON of another commit")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression")
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main(parser.parse_args()))
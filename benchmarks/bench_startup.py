@@ -0,0 +1,85 @@
+"""Cold start benchmark of the bot.
+
+Measures in fresh interpreters how long it takes to import autosg entry
+point and to get Telegram dispatcher ready to poll, and which heavy
+dependencies are loaded by then. No network access is needed.
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict, List
+
+
+HEAVY_MODULES = ["aiogram", "bs4", "curl_cffi", "tenacity", "steamspypi", "emoji"]
+
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import autosg.__main__
+imported = time.perf_counter()
+from autosg import tgbot
+storage, dispatcher = tgbot.init_tg()
+asyncio.run(tgbot.on_startup(dispatcher))
+ready = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "ready_s": ready - start,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def probe(workdir: str) -> Dict:
+    """Start a fresh interpreter and measure its startup"""
+    env = dict(os.environ)
+    env["TELEGRAM_TOKEN"] = "123456:bench"
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(pathlib.Path(__file__).resolve().parent.parent), env.get("PYTHONPATH", "")]
+    )
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE % HEAVY_MODULES],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - start
+    return result
+
+
+def main(runs: int) -> List[Dict]:
+    """Run probes and print medians"""
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [probe(workdir) for _ in range(runs)]
+
+    for key in ("import_s", "ready_s", "process_s"):
+        values = [result[key] for result in results]
+        print(
+            f"{key:>10}: median {statistics.median(values):.3f}s "
+            f"min {min(values):.3f}s max {max(values):.3f}s"
+        )
+    print(f"{'loaded':>10}: {', '.join(results[-1]['loaded'])}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    main(parser.parse_args().runs)
@@ -0,0 +1,149 @@
+"""End-to-end throughput benchmark of sgbot against local SteamGifts stand-in.
+
+Runs SGUser.enter_giveaways for a single user and a full start_gw_entering
+cycle for a growing number of users with timing constants compressed to
+zero. Reports requests per cycle, wall time, CPU time and peak memory.
+
+    python -m benchmarks.bench_throughput --users 1 10 100 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import resource
+import time
+from typing import TYPE_CHECKING
+
+from autosg import config
+from autosg.sgbot import rate_limit
+from autosg.sgbot import sg_interface as sg
+from autosg.sgbot import sgbot
+from autosg.sgbot.status import statuses
+
+from .fakes import GeneratedStorage, NullBot
+from .sg_standin import StandInConfig, SteamGiftsStandIn
+
+if TYPE_CHECKING:
+    from typing import Dict, List
+
+
+def _compress_timing(url: str) -> None:
+    """Point sgbot to the stand-in and remove all sleeps between requests"""
+    sg.SG_URL = url
+    sg.VERIFY_URL = url + "account/settings/profile"
+    sg.SG_THROTTLE = 0
+    sg.SG_JITTER = 0
+    rate_limit.set_limiter(rate_limit.RateLimiter(0))
+    sgbot.SG_USERS_DELAY = 0
+    sgbot.SG_CYCLE = 3600
+    # burning needs SteamSpy, keep the benchmark offline
+    sgbot.BURN_POINTS = sgbot.MAX_POINTS + 1
+    config.bot = NullBot()
+
+
+def _report(name: str, requests: int, cycles: int, wall: float, cpu: float) -> Dict:
+    """Print and return a result row"""
+    row = {
+        "name": name,
+        "requests_per_cycle": requests / cycles,
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    print(
+        f"{name:>28}: {row['requests_per_cycle']:8.1f} req/cycle "
+        f"{wall:8.2f}s wall {cpu:8.2f}s cpu {row['max_rss_mb']:8.1f}MB max rss"
+    )
+    return row
+
+
+async def bench_user(standin: SteamGiftsStandIn, sections: List[str], runs: int) -> Dict:
+    """Repeatedly run enter_giveaways for a single user"""
+    user = sgbot.SGUser("bench", "token-bench", sections)
+    requests = sum(standin.requests.values())
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        for _ in range(runs):
+            standin.regenerate()
+            await user.enter_giveaways()
+    finally:
+        await sgbot.sessions.discard(user.tg_id)
+
+    return _report(
+        "SGUser.enter_giveaways",
+        sum(standin.requests.values()) - requests,
+        runs,
+        time.perf_counter() - wall,
+        time.process_time() - cpu,
+    )
+
+
+async def bench_cycle(standin: SteamGiftsStandIn, sections: List[str], users: int) -> Dict:
+    """Run one start_gw_entering cycle over a number of users"""
+    storage = GeneratedStorage(users, sections)
+    # every cycle starts from full points, not from what the previous one left
+    standin.regenerate()
+    requests = sum(standin.requests.values())
+    started = time.time()
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    task = asyncio.create_task(sgbot.start_gw_entering(storage))
+    while not task.done() and not all(
+        statuses.get(user).last_run >= started for user in storage.users()
+    ):
+        await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    row = _report(
+        f"start_gw_entering x{users}",
+        sum(standin.requests.values()) - requests,
+        1,
+        time.perf_counter() - wall,
+        time.process_time() - cpu,
+    )
+    sgbot.SGUser.users = {}
+    for user in storage.users():
+        statuses.discard(user)
+    return row
+
+
+async def main(args: argparse.Namespace) -> List[Dict]:
+    """Start stand-in and run benchmarks"""
+    standin = SteamGiftsStandIn(
+        StandInConfig(
+            rows_per_page=args.rows,
+            faded_per_page=args.faded,
+            pages_per_section=args.pages,
+        )
+    )
+    runner = await standin.start()
+    host, port = runner.addresses[0][:2]
+    _compress_timing(f"http://{host}:{port}/")
+
+    results = []
+    try:
+        results.append(await bench_user(standin, args.sections, args.runs))
+        for users in args.users:
+            results.append(await bench_cycle(standin, args.sections, users))
+    finally:
+        await runner.cleanup()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--sections", nargs="+", default=["Wishlist", "Recommended"])
+    parser.add_argument("--runs", type=int, default=10, help="single user runs")
+    parser.add_argument("--rows", type=int, default=50, help="rows per page")
+    parser.add_argument("--faded", type=int, default=5, help="faded rows per page")
+    parser.add_argument("--pages", type=int, default=3, help="pages per section")
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,33 @@
+"""Telegram side replacements shared by benchmarks running sgbot offline"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import List, Tuple
+
+
+class NullBot:
+    """Telegram bot replacement swallowing notifications"""
+
+    def __init__(self) -> None:
+        self.sent: List[Tuple[str, str]] = []
+
+    async def send_message(self, user_id: str, text: str) -> None:
+        """Keep a notification instead of sending it"""
+        self.sent.append((user_id, text))
+
+
+class GeneratedStorage:
+    """Minimal replacement of JSONStorage with generated users"""
+
+    def __init__(self, users: int, sections: List[str]) -> None:
+        self.storage = {
+            str(idx): {str(idx): {"data": {"token": f"token-{idx}", "sections": sections}}}
+            for idx in range(users)
+        }
+
+    def users(self) -> List[str]:
+        """IDs of generated users"""
+        return list(self.storage)
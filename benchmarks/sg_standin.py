@@ -0,0 +1,190 @@
+"""Local stand-in for SteamGifts site to measure sgbot without hitting it.
+
+Serves generated search pages, home page with xsrf_token and points,
+profile page and entry_insert endpoint of ajax.php.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from typing import Dict, Tuple
+
+
+@dataclass
+class StandInConfig:
+    """Shape of generated content"""
+
+    rows_per_page: int = 50
+    faded_per_page: int = 5
+    pages_per_section: int = 3
+    start_points: int = 300
+    min_cost: int = 1
+    max_cost: int = 50
+    seed: int = 0
+
+
+ROW_TEMPLATE = """
+<div class="giveaway__row-outer-wrap">
+  <div class="{classes}">
+    <div class="giveaway__summary">
+      <h2 class="giveaway__heading">
+        <a class="giveaway__heading__name" href="/giveaway/{code}/game-{code}">Game {code}</a>
+        {copies}<span class="giveaway__heading__thin">({cost}P)</span>
+        <a class="giveaway__icon" target="_blank" href="https://store.steampowered.com/app/{steam_id}/"></a>
+      </h2>
+      <div class="giveaway__columns">
+        <div><span data-timestamp="{end_time}">1 hour</span> remaining</div>
+        <div><span data-timestamp="{start_time}">1 day</span> ago</div>
+        <div class="giveaway__column--contributor-level">Level {level}+</div>
+      </div>
+      <div class="giveaway__links">
+        <a href="/giveaway/{code}/game-{code}/entries"><span>{entries} entries</span></a>
+      </div>
+    </div>
+  </div>
+</div>
+"""
+
+PAGE_TEMPLATE = """<html><body>
+<div class="nav"><span class="nav__points">{points}</span></div>
+<input type="hidden" name="xsrf_token" value="{xsrf_token}" />
+{content}
+</body></html>"""
+
+
+class SteamGiftsStandIn:
+    """aiohttp application imitating SteamGifts pages used by sgbot"""
+
+    def __init__(self, config: StandInConfig = StandInConfig()) -> None:
+        self.config = config
+        self.requests: Counter[str] = Counter()
+        self.points: Dict[str, int] = {}
+        self.entered: Dict[str, set] = {}
+        self.costs: Dict[str, int] = {}
+        self._pages: Dict[Tuple[str, int], str] = {}
+        self.app = web.Application()
+        self.app.router.add_route("*", "/{tail:.*}", self.dispatch)
+
+    def _user(self, request: web.Request) -> str:
+        """User identified by PHPSESSID cookie"""
+        token = request.cookies.get("PHPSESSID", "")
+        self.points.setdefault(token, self.config.start_points)
+        self.entered.setdefault(token, set())
+        return token
+
+    def _page(self, token: str, content: str) -> str:
+        """Wrap content into a page with user's nav bar"""
+        return PAGE_TEMPLATE.format(
+            points=f"{self.points[token]:,}", xsrf_token=f"xsrf-{token}", content=content
+        )
+
+    def _search_content(self, query: str, page: int) -> str:
+        """Generated giveaway rows for a search page, cached per page"""
+        if (query, page) in self._pages:
+            return self._pages[(query, page)]
+
+        if page > self.config.pages_per_section:
+            content = '<div class="pagination--no-results">No results were found.</div>'
+        else:
+            rand = random.Random(f"{self.config.seed}-{query}-{page}")
+            now = int(time.time())
+            rows = []
+            for idx in range(self.config.rows_per_page):
+                code = f"{zlib.crc32(query.encode()) % 1000:03d}{page:03d}{idx:03d}"
+                cost = rand.randint(self.config.min_cost, self.config.max_cost)
+                self.costs[code] = cost
+                copies = rand.choice([1, 1, 1, 1, 2, 5])
+                rows.append(
+                    ROW_TEMPLATE.format(
+                        classes="giveaway__row-inner-wrap"
+                        + (" is-faded" if idx < self.config.faded_per_page else ""),
+                        code=code,
+                        cost=cost,
+                        copies=f'<span class="giveaway__heading__thin">({copies} Copies)</span>'
+                        if copies > 1
+                        else "",
+                        steam_id=rand.randint(10, 2_000_000),
+                        end_time=now + rand.randint(600, 7 * 86400),
+                        start_time=now - rand.randint(600, 86400),
+                        level=rand.randint(0, 10),
+                        entries=f"{rand.randint(0, 20000):,}",
+                    )
+                )
+            content = "\n".join(rows)
+
+        self._pages[(query, page)] = content
+        return content
+
+    async def dispatch(self, request: web.Request) -> web.Response:
+        """Route a request by its path, tolerating doubled slashes"""
+        path = "/" + request.path.strip("/")
+        token = self._user(request)
+
+        if request.method == "POST" and path == "/ajax.php":
+            self.requests["ajax"] += 1
+            return await self._ajax(request, token)
+
+        if path == "/":
+            self.requests["home"] += 1
+            return web.Response(text=self._page(token, ""), content_type="text/html")
+
+        if path == "/account/settings/profile":
+            self.requests["profile"] += 1
+            return web.Response(text=self._page(token, "<form></form>"), content_type="text/html")
+
+        if path == "/giveaways/search":
+            self.requests["search"] += 1
+            query = "&".join(
+                f"{key}={value}" for key, value in sorted(request.query.items()) if key != "page"
+            )
+            page = int(request.query.get("page", "1"))
+            return web.Response(
+                text=self._page(token, self._search_content(query, page)),
+                content_type="text/html",
+            )
+
+        self.requests["unknown"] += 1
+        raise web.HTTPNotFound()
+
+    async def _ajax(self, request: web.Request, token: str) -> web.Response:
+        """Imitate entry_insert action"""
+        form = await request.post()
+        code = str(form.get("code", ""))
+        if form.get("do") != "entry_insert" or form.get("xsrf_token") != f"xsrf-{token}":
+            return web.json_response({"type": "error", "msg": "Invalid request"})
+
+        cost = self.costs.get(code)
+        if cost is None:
+            return web.json_response({"type": "error", "msg": "Giveaway not found"})
+        if code in self.entered[token]:
+            return web.json_response({"type": "error", "msg": "Previously Entered"})
+        if cost > self.points[token]:
+            return web.json_response({"type": "error", "msg": "Not Enough Points"})
+
+        self.points[token] -= cost
+        self.entered[token].add(code)
+        return web.json_response(
+            {"type": "success", "entry_count": "1", "points": str(self.points[token])}
+        )
+
+    def regenerate(self, points: int = 0) -> None:
+        """Reset users' points for a new cycle"""
+        for token in self.points:
+            self.points[token] = points or self.config.start_points
+            self.entered[token].clear()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        """Start serving, return runner to find address and to stop it"""
+        runner = web.AppRunner(self.app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
@@ -0,0 +1,476 @@
+"""Discrete-event simulation of sgbot for tuning scheduling constants.
+
+Runs real start_gw_entering and deadline entering for generated users on
+a virtual clock against a synthetic SteamGifts: giveaways of every section
+arrive at a steady rate, get entries while they run, and users' points
+regenerate in steps up to the site's cap. Sleeps take no real time, so
+days of bot operation are simulated in seconds. Reports points wasted at
+the cap, entries per request and requests per hour.
+
+    python -m benchmarks.simulate --users 10 --hours 72 --cycle 7200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import selectors
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qsl, urlsplit
+
+from autosg import config
+from autosg.sgbot import rate_limit, sgbot, transport
+from autosg.sgbot import sg_interface as sg
+from autosg.sgbot.status import statuses
+
+from .fakes import GeneratedStorage, NullBot
+from .sg_standin import PAGE_TEMPLATE, ROW_TEMPLATE
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, List, Optional
+
+
+ROWS_PER_PAGE = 50
+
+
+@dataclass
+class GiveawayModel:
+    """How giveaways of a section appear and get entries"""
+
+    arrivals_per_hour: float = 30
+    min_duration: int = 3600
+    max_duration: int = 7 * 86400
+    min_cost: int = 1
+    max_cost: int = 50
+    max_entry_rate: float = 200
+
+
+@dataclass
+class PointsModel:
+    """How users' points regenerate"""
+
+    grant_interval: int = 900
+    points_per_grant: int = 6
+    points_cap: int = 400
+    start_points: int = 300
+
+
+@dataclass
+class WorldConfig:
+    """Synthetic model of SteamGifts"""
+
+    giveaways: GiveawayModel = field(default_factory=GiveawayModel)
+    points: PointsModel = field(default_factory=PointsModel)
+    latency: float = 0.3
+    seed: int = 0
+
+
+@dataclass
+class _Giveaway:
+    """Giveaway state kept by the world"""
+
+    code: str
+    cost: int
+    copies: int
+    steam_id: int
+    start_time: float
+    end_time: float
+    entry_rate: float
+
+    def entries(self, now: float) -> int:
+        """Entries made by other users so far"""
+        return int(self.entry_rate * (min(now, self.end_time) - self.start_time) / 3600)
+
+
+@dataclass
+class _Account:
+    """User's points with lazily applied regeneration"""
+
+    points: int
+    offset: float
+    grants: int = 0
+    regenerated: int = 0
+    wasted: int = 0
+    spent: int = 0
+    entered: Dict[str, _Giveaway] = field(default_factory=dict)
+
+
+@dataclass
+class _Section:
+    """Open giveaways of a section and time the next one arrives"""
+
+    next_arrival: float
+    pool: List[_Giveaway] = field(default_factory=list)
+
+
+class World:
+    """Synthetic SteamGifts shared by all simulated sessions"""
+
+    def __init__(self, world_config: WorldConfig) -> None:
+        self.config = world_config
+        self.rand = random.Random(world_config.seed)
+        self.requests: Counter[str] = Counter()
+        self.accounts: Dict[str, _Account] = {}
+        self.giveaways: Dict[str, _Giveaway] = {}
+        self._sections: Dict[str, _Section] = {}
+        self._codes = itertools.count()
+
+    def account(self, token: str) -> _Account:
+        """User's account brought up to date with points regeneration"""
+        model = self.config.points
+        account = self.accounts.get(token)
+        if account is None:
+            account = self.accounts[token] = _Account(
+                model.start_points, time.time() + self.rand.uniform(0, model.grant_interval)
+            )
+
+        due = math.floor((time.time() - account.offset) / model.grant_interval) + 1
+        for _ in range(due - account.grants):
+            points = account.points + model.points_per_grant
+            account.points = min(points, model.points_cap)
+            account.regenerated += model.points_per_grant
+            account.wasted += points - account.points
+        account.grants = max(due, account.grants)
+        return account
+
+    def _arrive(self, now: float) -> _Giveaway:
+        """Create a giveaway in a section"""
+        model = self.config.giveaways
+        giveaway = _Giveaway(
+            code=f"{next(self._codes):05d}",
+            cost=self.rand.randint(model.min_cost, model.max_cost),
+            copies=self.rand.choice([1, 1, 1, 1, 2, 5]),
+            steam_id=self.rand.randint(10, 2_000_000),
+            start_time=now,
+            end_time=now + self.rand.uniform(model.min_duration, model.max_duration),
+            entry_rate=self.rand.uniform(1, model.max_entry_rate),
+        )
+        self.giveaways[giveaway.code] = giveaway
+        return giveaway
+
+    def section(self, query: str) -> List[_Giveaway]:
+        """Open giveaways of a section, newest first"""
+        now = time.time()
+        model = self.config.giveaways
+        # start in a steady state with giveaways created before the run
+        section = self._sections.setdefault(query, _Section(now - model.max_duration))
+
+        interval = 3600 / model.arrivals_per_hour
+        while section.next_arrival <= now:
+            section.pool.append(self._arrive(section.next_arrival))
+            section.next_arrival += self.rand.expovariate(1 / interval)
+
+        section.pool[:] = [giveaway for giveaway in section.pool if giveaway.end_time > now]
+        return section.pool[::-1]
+
+    def _row(self, giveaway: _Giveaway, account: _Account, now: float) -> str:
+        """Render a search page row"""
+        return ROW_TEMPLATE.format(
+            classes="giveaway__row-inner-wrap"
+            + (" is-faded" if giveaway.code in account.entered else ""),
+            code=giveaway.code,
+            cost=giveaway.cost,
+            copies=f'<span class="giveaway__heading__thin">({giveaway.copies} Copies)</span>'
+            if giveaway.copies > 1
+            else "",
+            steam_id=giveaway.steam_id,
+            end_time=int(giveaway.end_time),
+            start_time=int(giveaway.start_time),
+            level=0,
+            entries=f"{giveaway.entries(now):,}",
+        )
+
+    def page(self, token: str, url: str) -> str:
+        """Render a page requested by a user"""
+        account = self.account(token)
+        parts = urlsplit(url)
+        path = "/" + "/".join(part for part in parts.path.split("/") if part)
+        content = ""
+
+        if path == "/giveaways/search":
+            self.requests["search"] += 1
+            query = sorted((key, value) for key, value in parse_qsl(parts.query) if key != "page")
+            page = int(dict(parse_qsl(parts.query)).get("page", "1"))
+            rows = self.section("&".join(f"{key}={value}" for key, value in query))
+            rows = rows[(page - 1) * ROWS_PER_PAGE : page * ROWS_PER_PAGE]
+            now = time.time()
+            content = (
+                "\n".join(self._row(giveaway, account, now) for giveaway in rows)
+                if rows
+                else '<div class="pagination--no-results">No results were found.</div>'
+            )
+        elif path == "/account/settings/profile":
+            self.requests["profile"] += 1
+        else:
+            self.requests["home"] += 1
+
+        return PAGE_TEMPLATE.format(
+            points=f"{account.points:,}", xsrf_token=f"xsrf-{token}", content=content
+        )
+
+    def enter(self, token: str, data: Dict) -> Dict:
+        """Imitate entry_insert action"""
+        self.requests["ajax"] += 1
+        account = self.account(token)
+        giveaway = self.giveaways.get(str(data.get("code", "")))
+        if giveaway is None or giveaway.end_time <= time.time():
+            return {"type": "error", "msg": "Giveaway has ended"}
+        if giveaway.code in account.entered:
+            return {"type": "error", "msg": "Previously Entered"}
+        if giveaway.cost > account.points:
+            return {"type": "error", "msg": "Not Enough Points"}
+
+        account.points -= giveaway.cost
+        account.spent += giveaway.cost
+        account.entered[giveaway.code] = giveaway
+        return {"type": "success", "entry_count": "1", "points": str(account.points)}
+
+    def steamspy(self, data_request: Dict) -> Dict:
+        """Votes of a game, stable for a steam_id"""
+        self.requests["steamspy"] += 1
+        rand = random.Random(data_request.get("appid"))
+        return {"positive": rand.randint(0, 50_000), "negative": rand.randint(0, 10_000)}
+
+
+@dataclass
+class _Response:
+    """Response attributes sessions rely on"""
+
+    text: str
+    status_code: int = 200
+    history: List[Dict] = field(default_factory=list)
+
+
+class _Cookies(dict):
+    """Cookie jar stand-in"""
+
+    def set(self, name: str, value: str) -> None:
+        """Set a cookie"""
+        self[name] = value
+
+
+class SimulatedSession:
+    """HTTP session answering from the synthetic world after a latency"""
+
+    def __init__(self, world: World) -> None:
+        self.world = world
+        self.cookies = _Cookies()
+
+    async def get(self, url: str) -> _Response:
+        """GET a page"""
+        await asyncio.sleep(self.world.config.latency)
+        return _Response(self.world.page(self.cookies.get("PHPSESSID", ""), url))
+
+    async def post(self, url: str, data: Optional[Dict] = None) -> _Response:
+        """POST a form, only entry_insert action is simulated"""
+        if not urlsplit(url).path.endswith("/ajax.php"):
+            raise ValueError(f"Unexpected POST to {url}")
+        await asyncio.sleep(self.world.config.latency)
+        return _Response(json.dumps(self.world.enter(self.cookies.get("PHPSESSID", ""), data or {})))
+
+    async def close(self) -> None:
+        """Nothing to close"""
+
+    async def __aenter__(self) -> SimulatedSession:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+
+class VirtualClock:
+    """Simulated wall and monotonic time"""
+
+    def __init__(self) -> None:
+        self.start = time.time()
+        self.elapsed = 0.0
+
+    def time(self) -> float:
+        """Simulated wall time"""
+        return self.start + self.elapsed
+
+    def monotonic(self) -> float:
+        """Simulated monotonic time"""
+        return self.elapsed
+
+    def advance(self, seconds: float) -> None:
+        """Move time forward"""
+        self.elapsed += max(0, seconds)
+
+
+# the platform's selector is extended as is, however deep its hierarchy is
+class _VirtualSelector(selectors.DefaultSelector):  # pylint: disable=too-many-ancestors
+    """Selector jumping the clock to the next timer instead of waiting"""
+
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__()
+        self.clock = clock
+        self.loop: Optional[VirtualEventLoop] = None
+
+    def select(self, timeout: Optional[float] = None) -> List:
+        events = super().select(0)
+        if events:
+            return events
+        # threads finish in real time, wait for them before jumping ahead
+        if timeout is None or (self.loop and self.loop.in_executor):
+            return super().select(timeout)
+        self.clock.advance(timeout)
+        return []
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """Event loop running on a virtual clock"""
+
+    def __init__(self, clock: VirtualClock) -> None:
+        selector = _VirtualSelector(clock)
+        super().__init__(selector)
+        selector.loop = self
+        self.in_executor = 0
+
+    def run_in_executor(self, executor: Any, func: Any, *args: Any) -> asyncio.Future:
+        """Run a function in executor, counting it as pending until it returns"""
+        future = super().run_in_executor(executor, func, *args)
+        self.in_executor += 1
+        future.add_done_callback(self._executor_done)
+        return future
+
+    def _executor_done(self, _: asyncio.Future) -> None:
+        self.in_executor -= 1
+
+
+def _configure(args: argparse.Namespace, world: World) -> None:
+    """Patch bot constants and plug in the synthetic world"""
+    sgbot.SG_CYCLE = args.cycle
+    sgbot.SG_USERS_DELAY = args.users_delay
+    sgbot.BURN_POINTS = args.burn_points
+    sgbot.MAX_POINTS_TO_KEEP = args.max_points_to_keep
+    sgbot.BURN_GAME_SET = args.burn_game_set
+    sgbot.POINTS_PER_HOUR = args.points_per_grant * 3600 / world.config.points.grant_interval
+    sg.SG_THROTTLE = args.throttle
+    sg.SG_JITTER = args.jitter
+    sg.ENTRY_CONCURRENCY = args.concurrency
+    rate_limit.set_limiter(rate_limit.RateLimiter(args.interval))
+    transport.new_session = lambda: SimulatedSession(world)
+    transport.steamspy_download = world.steamspy
+    config.bot = NullBot()
+
+
+async def simulate(args: argparse.Namespace) -> None:
+    """Run the bot for a simulated period"""
+    storage = GeneratedStorage(args.users, args.sections)
+    tasks = [
+        asyncio.create_task(sgbot.start_gw_entering(storage)),
+        asyncio.create_task(sgbot.start_deadline_entering()),
+    ]
+    await asyncio.sleep(args.hours * 3600)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def report(world: World, hours: float, wall: float) -> Dict:
+    """Print and return simulation results"""
+    now = time.time()
+    accounts = [world.account(token) for token in list(world.accounts)]
+    sg_requests = {kind: count for kind, count in world.requests.items() if kind != "steamspy"}
+    requests = sum(sg_requests.values())
+    lookups = world.requests["steamspy"]
+    entries = sum(len(account.entered) for account in accounts)
+    regenerated = sum(account.regenerated for account in accounts)
+    wasted = sum(account.wasted for account in accounts)
+    # chance to win with entries other users made by the end of a giveaway
+    wins = sum(
+        giveaway.copies / (giveaway.entries(giveaway.end_time) + 1)
+        for account in accounts
+        for giveaway in account.entered.values()
+    )
+    result = {
+        "hours": hours,
+        "users": len(accounts),
+        "requests": sg_requests,
+        "requests_per_hour": requests / hours,
+        "steamspy_lookups": lookups,
+        "entries": entries,
+        "entries_per_request": entries / max(requests, 1),
+        "points_regenerated": regenerated,
+        "points_spent": sum(account.spent for account in accounts),
+        "points_wasted": wasted,
+        "expected_wins": wins,
+        "open_entries": sum(
+            giveaway.end_time > now for account in accounts for giveaway in account.entered.values()
+        ),
+    }
+    print(f"Simulated {hours:.1f}h for {len(accounts)} users in {wall:.1f}s")
+    print(
+        f"  requests: {requests} ({result['requests_per_hour']:.1f}/h) "
+        + " ".join(f"{kind} {count}" for kind, count in sorted(sg_requests.items()))
+    )
+    print(f"  steamspy lookups: {lookups} for burn ranking")
+    print(f"  entries: {entries} ({result['entries_per_request']:.3f} per request), expected wins {wins:.2f}")
+    print(
+        f"  points: regenerated {regenerated}, spent {result['points_spent']}, "
+        f"wasted at cap {wasted} ({100 * wasted / max(regenerated, 1):.1f}%)"
+    )
+    return result
+
+
+def main(args: argparse.Namespace) -> Dict:
+    """Run a simulation with the given configuration"""
+    random.seed(args.seed)
+    clock = VirtualClock()
+    world = World(
+        WorldConfig(
+            giveaways=GiveawayModel(arrivals_per_hour=args.arrivals),
+            points=PointsModel(points_per_grant=args.points_per_grant),
+            latency=args.latency,
+            seed=args.seed,
+        )
+    )
+    _configure(args, world)
+
+    real_time, real_monotonic = time.time, time.monotonic
+    wall = time.perf_counter()
+    time.time, time.monotonic = clock.time, clock.monotonic
+    try:
+        with asyncio.Runner(loop_factory=lambda: VirtualEventLoop(clock)) as runner:
+            runner.run(simulate(args))
+        return report(world, args.hours, time.perf_counter() - wall)
+    finally:
+        time.time, time.monotonic = real_time, real_monotonic
+        for user in sgbot.SGUser.users:
+            statuses.discard(user)
+        sgbot.SGUser.users = {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--sections", nargs="+", default=["Wishlist", "Recommended", "All"])
+    parser.add_argument("--hours", type=float, default=72)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--arrivals", type=float, default=30, help="new giveaways per hour per section")
+    parser.add_argument("--points-per-grant", type=int, default=6, help="points regenerated every 15 minutes")
+    parser.add_argument("--latency", type=float, default=0.3, help="response time of the site")
+    parser.add_argument("--cycle", type=int, default=sgbot.SG_CYCLE, help="SG_CYCLE")
+    parser.add_argument("--users-delay", type=int, default=sgbot.SG_USERS_DELAY, help="SG_USERS_DELAY")
+    parser.add_argument("--burn-points", type=int, default=sgbot.BURN_POINTS, help="BURN_POINTS")
+    parser.add_argument(
+        "--max-points-to-keep", type=int, default=sgbot.MAX_POINTS_TO_KEEP, help="MAX_POINTS_TO_KEEP"
+    )
+    parser.add_argument("--burn-game-set", type=int, default=sgbot.BURN_GAME_SET, help="BURN_GAME_SET")
+    parser.add_argument("--throttle", type=float, default=sg.SG_THROTTLE, help="SG_THROTTLE")
+    parser.add_argument("--jitter", type=float, default=sg.SG_JITTER, help="SG_JITTER")
+    parser.add_argument(
+        "--interval", type=float, default=rate_limit.SG_GLOBAL_INTERVAL, help="global rate limiter interval"
+    )
+    parser.add_argument("--concurrency", type=int, default=sg.ENTRY_CONCURRENCY, help="ENTRY_CONCURRENCY")
+    logging.basicConfig(level=logging.ERROR)
+    main(parser.parse_args())